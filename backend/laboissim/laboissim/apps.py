@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class LaboissimConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'laboissim'
+
+    def ready(self):
+        # Register the signal handlers that live outside models.py
+        from . import (  # noqa: F401
+            authentication, derivatives, events, file_cleanup, project_stats, public_feed, search, site_content,
+            team_directory, text_extraction, user_emails,
+        )
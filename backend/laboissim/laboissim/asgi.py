@@ -5,6 +5,26 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Deployment profile
+------------------
+
+    pip install uvicorn gunicorn
+    gunicorn laboissim.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+(or `uvicorn laboissim.asgi:application --workers 4`). The public projects
+feed, team members, publications list and site content GETs are async views
+(async_views.py) that wait on the cache and database without holding a
+thread, so one worker serves many concurrent slow clients. Every other view
+is synchronous and runs in a thread of its own per request, as under WSGI.
+The whole middleware stack is async-capable, so no extra thread switch is
+added around the async views.
+
+Keep CONN_MAX_AGE at 0 (the default): database connections belong to the
+threads the ORM runs in and are not reused across requests under ASGI.
+
+`manage.py benchmark_api --asgi` drives every route through Django's ASGI
+handler and fails on any server error, which is how this profile is checked.
 """
 
 import os
@@ -0,0 +1,163 @@
+"""
+Async GET handlers for the read-heavy endpoints: the public projects feed,
+the team directory, the publications list and the site content.
+
+Under ASGI these run on the event loop and await the cache and the async
+ORM, so a worker serves many slow clients without holding a thread for
+each. Only what exists solely in synchronous form runs in a thread with
+sync_to_async: DRF authentication (for the endpoints whose response depends
+on the user), cursor pagination and serialization, since serializer fields
+may query (lazy relations, method fields). The payloads are the ones of the
+DRF views, which they reuse for querysets, serializers and pagination.
+
+Any other method is handed to the DRF view in a thread. Under WSGI Django
+runs these views through async_to_sync, so they keep working unchanged.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import public_feed, site_content
+from .permission_context import get_permission_context
+from .publication_views import PublicationViewSet
+from .views import ProjectViewSet, SiteContentView, TeamMembersView
+
+
+class AsyncReadView(View):
+    """
+    Serves GET/HEAD with the async `get` handler, everything else with
+    `sync_view`, the DRF view of the same route.
+    """
+    sync_view = None
+    # Run the DRF authentication classes before `get` (anonymous requests
+    # stay on the event loop: they need no query)
+    authenticate = False
+    authentication_required = False
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Unsafe methods go to the DRF view, which does its own CSRF checks
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+
+        drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+        try:
+            if self.authenticate:
+                await self.perform_authentication(drf_request)
+            return await self.get(drf_request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(drf_request, exc)
+
+    async def perform_authentication(self, request):
+        def authenticate():
+            user = request.user
+            # Loaded here so serializers can check permissions on the event loop
+            get_permission_context(user)
+
+        if 'HTTP_AUTHORIZATION' not in request.META and not request.COOKIES:
+            # No credentials at all: anonymous without asking the authenticators
+            request.user = AnonymousUser()
+        else:
+            await sync_to_async(authenticate)()
+        if self.authentication_required and not request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+
+    def handle_exception(self, request, exc):
+        # The body and headers DRF's exception handler would send
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = self.render(data, exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            header = request.authenticators[0].authenticate_header(request) if request.authenticators else None
+            if header:
+                response['WWW-Authenticate'] = header
+            else:
+                response.status_code = 403
+        return response
+
+    @staticmethod
+    def render(data, status=200):
+        return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+    @staticmethod
+    async def paginate(view, queryset):
+        """The DRF view's page of `queryset`, or None when pagination was not asked for"""
+        return await sync_to_async(view.paginate_queryset)(queryset)
+
+    @staticmethod
+    async def serialize(view, objects):
+        """The DRF view's serializer data for `objects`, built in a thread"""
+        return await sync_to_async(lambda: view.get_serializer(objects, many=True).data)()
+
+
+class PublicProjectsView(AsyncReadView):
+    """GET /api/projects/public, same payload and validators as ProjectViewSet.public"""
+    # With the @action's own options (AllowAny), as the router would
+    sync_view = staticmethod(ProjectViewSet.as_view({'get': 'public'}, **ProjectViewSet.public.kwargs))
+    authenticate = True
+
+    async def get(self, request):
+        state = await public_feed.aget_state()
+        etag = public_feed.etag_for(request, state)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=state['last_modified'])
+        if not_modified is not None:
+            return public_feed.add_validators(not_modified, etag, state)
+
+        data = await public_feed.aget_cached(etag)
+        if data is None:
+            view = ProjectViewSet(request=request, format_kwarg=None, action='public', kwargs={})
+            validated_projects = public_feed.filter_ids(request, view.get_queryset().filter(is_validated=True))
+            page = await self.paginate(view, validated_projects)
+            if page is not None:
+                data = view.get_paginated_response(await self.serialize(view, page)).data
+            else:
+                projects = [project async for project in validated_projects]
+                data = await self.serialize(view, projects)
+            await public_feed.aset_cached(etag, data)
+        return public_feed.add_validators(self.render(data), etag, state)
+
+
+class TeamMembersAsyncView(AsyncReadView):
+    """GET /api/team-members/, same payload as TeamMembersView"""
+    sync_view = staticmethod(TeamMembersView.as_view())
+
+    async def get(self, request):
+        view = TeamMembersView(request=request, format_kwarg=None, kwargs={})
+        queryset = view.get_queryset()
+        page = await self.paginate(view, queryset)
+        if page is not None:
+            return self.render(view.get_paginated_response([entry.data for entry in page]).data)
+        return self.render([data async for data in queryset.values_list('data', flat=True)])
+
+
+class PublicationListView(AsyncReadView):
+    """GET /api/publications, same payload as PublicationViewSet.list"""
+    sync_view = staticmethod(PublicationViewSet.as_view({'get': 'list', 'post': 'create'}))
+
+    async def get(self, request):
+        view = PublicationViewSet(request=request, format_kwarg=None, action='list', kwargs={})
+        queryset = view.get_queryset()
+        page = await self.paginate(view, queryset)
+        if page is not None:
+            return self.render(view.get_paginated_response(await self.serialize(view, page)).data)
+        publications = [publication async for publication in queryset]
+        return self.render(await self.serialize(view, publications))
+
+
+class SiteContentAsyncView(AsyncReadView):
+    """GET /api/site-content/ for signed-in users, same payload as SiteContentView"""
+    sync_view = staticmethod(SiteContentView.as_view())
+    authenticate = True
+    authentication_required = True
+
+    async def get(self, request):
+        return self.render(await site_content.aget_data())
@@ -1,15 +1,36 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 
+from . import password_hashing
+from .user_emails import find_user
+
 UserModel = get_user_model()
 
 class EmailBackend(ModelBackend):
+    """
+    Logs in with an email (case-insensitive) or a username, checking the
+    password on the hashing pool (see password_hashing.py). It replaces
+    ModelBackend, so every attempt costs exactly one hash.
+    """
+
     def authenticate(self, request, username=None, password=None, **kwargs):
-        email = kwargs.get('email', username)
+        identifier = kwargs.get('email', username)
+        if identifier is None or password is None:
+            return None
+        # Case-insensitive, through the UserEmail index
+        user = find_user(identifier)
+        if user is None:
+            user = self._get_by_username(identifier)
+        if user is None:
+            password_hashing.check_unknown(password)
+            return None
+        if password_hashing.check_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    @staticmethod
+    def _get_by_username(username):
         try:
-            user = UserModel.objects.get(email=email)
+            return UserModel._default_manager.get_by_natural_key(username)
         except UserModel.DoesNotExist:
             return None
-        if user.check_password(password) and self.user_can_authenticate(user):
-            return user
-        return None 
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+JWT authentication that resolves the user from a cache.
+
+simplejwt's JWTAuthentication loads the User row on every request, and the
+permission checks then load its UserProfile. CachedJWTAuthentication keeps
+both rows, keyed by user id, in the JWT_USER_CACHE alias for
+JWT_USER_CACHE_TIMEOUT seconds, so an authenticated request usually runs no
+query to find out who is calling and with which role. Saving or deleting a
+User or UserProfile (update_user_role saves both) drops the entry.
+
+The password hash is never cached: the cached user has it deferred and
+loads it on first access.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from . import metrics
+from .models import UserProfile
+
+USER_FIELDS = [field.attname for field in User._meta.concrete_fields if field.attname != 'password']
+PROFILE_FIELDS = [field.attname for field in UserProfile._meta.concrete_fields]
+
+
+def _cache():
+    alias = getattr(settings, 'JWT_USER_CACHE', 'default')
+    return caches[alias] if alias else None
+
+
+def cache_key(user_id):
+    return f'jwt_user:{user_id}'
+
+
+def _load(user_id):
+    """(user values, profile values or None) of `user_id`, in one query"""
+    user = User.objects.select_related('profile').defer('password').get(pk=user_id)
+    try:
+        profile = user.profile
+    except UserProfile.DoesNotExist:
+        profile = None
+    return ([getattr(user, name) for name in USER_FIELDS],
+            [getattr(profile, name) for name in PROFILE_FIELDS] if profile is not None else None)
+
+
+def _build(user_values, profile_values):
+    user = User.from_db('default', USER_FIELDS, user_values)
+    # Assigning the reverse one-to-one caches it, None included, so
+    # user.profile costs no query
+    user.profile = UserProfile.from_db('default', PROFILE_FIELDS, profile_values) if profile_values else None
+    return user
+
+
+def get_cached_user(user_id):
+    """The user with its profile attached, from the cache or one query"""
+    cache = _cache()
+    entry = cache.get(cache_key(user_id)) if cache is not None else None
+    metrics.cache_lookup('jwt_user', entry is not None)
+    if entry is None:
+        entry = _load(user_id)
+        if cache is not None:
+            cache.set(cache_key(user_id), entry, getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 60))
+    return _build(*entry)
+
+
+def invalidate(user_id):
+    cache = _cache()
+    if cache is not None:
+        cache.delete(cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication with the user and profile read through get_cached_user"""
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Compares against the password hash, which is not cached
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        try:
+            user = get_cached_user(user_id)
+        except (User.DoesNotExist, ValueError) as e:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found') from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    # After commit, so no request can cache the old rows again
+    transaction.on_commit(lambda: invalidate(user_id))
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate(user_id))
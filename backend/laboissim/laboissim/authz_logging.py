@@ -0,0 +1,45 @@
+"""
+Audit logging for authorization decisions.
+
+Decisions go to the 'laboissim.authz' logger: denials at INFO, grants at
+DEBUG. Nothing is formatted unless the logger is enabled for that level, and
+grants can be sampled with the AUTHZ_LOG_SAMPLE_RATE setting (0.0 to 1.0).
+"""
+import logging
+import random
+
+from django.conf import settings
+
+logger = logging.getLogger('laboissim.authz')
+
+
+def log_decision(request, view, obj, granted, reason):
+    level = logging.DEBUG if granted else logging.INFO
+    if not logger.isEnabledFor(level):
+        return
+    if granted:
+        rate = getattr(settings, 'AUTHZ_LOG_SAMPLE_RATE', 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return
+
+    user = request.user
+    fields = {
+        'authz_granted': granted,
+        'authz_reason': reason,
+        'authz_user_id': user.pk,
+        'authz_action': getattr(view, 'action', None),
+        'authz_object': f'{obj._meta.label}:{obj.pk}' if obj is not None else None,
+        'authz_method': request.method,
+        'authz_path': request.path,
+    }
+    # Arguments are only interpolated if a handler actually emits the record
+    logger.log(
+        level,
+        'authz %s user=%s action=%s object=%s reason=%s',
+        'granted' if granted else 'denied',
+        fields['authz_user_id'],
+        fields['authz_action'],
+        fields['authz_object'],
+        reason,
+        extra=fields,
+    )
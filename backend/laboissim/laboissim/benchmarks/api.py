@@ -0,0 +1,368 @@
+"""
+API benchmark scenarios: one or more requests per route in urls.py, run
+through the DRF test client against seeded data (see seed.py), or through
+Django's ASGI handler to check the ASGI deployment.
+
+Every request runs in a transaction that is rolled back afterwards, so
+write scenarios can be repeated against the same data. A scenario's
+`prepare` hook runs inside that transaction, before the timed request, to
+create whatever the request consumes (a pending deletion request, a
+complete upload, ...). Its `check` hook runs after the request, in the same
+transaction, to verify side effects the response does not show.
+"""
+import json
+import os
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import AsyncClient
+from django.test.client import BOUNDARY, encode_multipart
+from django.urls import URLResolver, get_resolver
+from asgiref.sync import async_to_sync
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ..models import (Project, ProjectDeletionRequest, ProjectDocument, Publication, UploadSession, UserFile,
+                      UserProfile)
+
+PASSWORD = 'benchmark'
+
+# Routes that cannot be driven from a test client, with the reason
+SKIPPED_ROUTES = {
+    'begin': 'redirects to the Google OAuth2 consent screen',
+    'complete': 'OAuth2 callback from Google',
+    'idp_launch': 'SAML identity provider launch, not configured',
+    'app_launch': 'OAuth2 app launch, not configured',
+    'disconnect': 'needs an associated social account',
+    'disconnect_individual': 'needs an associated social account',
+    'google_login_jwt': 'needs a Google access token',
+    'events': 'an endless event stream',
+}
+
+
+@dataclass
+class Scenario:
+    route: str
+    method: str
+    path: str
+    user: Optional[str] = None
+    data: object = None
+    format: Optional[str] = None
+    prepare: Optional[Callable] = None
+    content_type: Optional[str] = None
+    # Every timed request must answer this, or the run fails: a 4xx would time the error path
+    expected_status: int = 200
+    # Returns what went wrong, if anything, to fail the run
+    check: Optional[Callable] = None
+
+    @property
+    def key(self):
+        # Scenarios of the same route differ by method or query string
+        query = self.path.partition('?')[2]
+        return f'{self.method.upper()} {self.route}' + (f' ?{query}' if query else '')
+
+
+@dataclass
+class Result:
+    scenario: Scenario
+    status_codes: set = field(default_factory=set)
+    timings: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+    sizes: list = field(default_factory=list)
+    problems: set = field(default_factory=set)
+
+    def summary(self):
+        timings = sorted(self.timings)
+        return {
+            'status': sorted(self.status_codes),
+            'expected_status': self.scenario.expected_status,
+            'problems': sorted(self.problems),
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))], 2),
+            'queries': max(self.queries),
+            'bytes': max(self.sizes),
+        }
+
+
+def route_names():
+    """Names of every route in the URLconf, except the Django admin"""
+    names = set()
+
+    def walk(patterns, prefix=''):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                if pattern.app_name == 'admin':
+                    continue
+                walk(pattern.url_patterns, prefix + str(pattern.pattern))
+            elif pattern.name:
+                names.add(pattern.name)
+
+    walk(get_resolver().url_patterns)
+    return names
+
+
+def create_fixtures(media_file_size=256 * 1024):
+    """Users and objects the scenarios act on, created next to the seeded data"""
+    admin = User.objects.create_user('bench_admin', 'bench_admin@example.org', PASSWORD, is_staff=True)
+    admin.profile.role = 'admin'
+    admin.profile.save()
+    member = User.objects.create_user('bench_member', 'bench_member@example.org', PASSWORD)
+    other = User.objects.create_user('bench_other', 'bench_other@example.org', PASSWORD)
+    # Accounts from before profiles were created on signup have none
+    no_profile = User.objects.create_user('bench_no_profile', 'bench_no_profile@example.org', PASSWORD)
+    UserProfile.objects.filter(user=no_profile).delete()
+
+    project = Project.objects.create(title='Benchmark project', description='Benchmark project',
+                                     created_by=member, is_validated=True)
+    project.members.add(member, *User.objects.order_by('pk')[:5])
+    # Give the member's project a realistic number of documents
+    documents = [ProjectDocument(project=project, file=f'project_files/bench_{i}.pdf', name=f'bench_{i}.pdf',
+                                 uploaded_by=member) for i in range(20)]
+    ProjectDocument.objects.bulk_create(documents)
+    document = ProjectDocument(project=project, name='bench_download.pdf', uploaded_by=member)
+    document.file.save('bench_download.pdf', ContentFile(os.urandom(media_file_size)), save=False)
+    document.save()
+
+    no_profile_project = Project.objects.create(title='Benchmark profile-less creator', description='p',
+                                                created_by=no_profile, is_validated=True)
+    pending_project = Project.objects.create(title='Benchmark deletion', description='d',
+                                             created_by=member, is_validated=True)
+    deletion_request = ProjectDeletionRequest.objects.create(project=pending_project, requested_by=member,
+                                                             reason='benchmark')
+    user_file = UserFile(name='bench.pdf', uploaded_by=member, file_type='application/pdf', size=media_file_size)
+    user_file.file.save('bench.pdf', ContentFile(os.urandom(media_file_size)), save=False)
+    user_file.save()
+    publication = Publication.objects.create(title='Benchmark publication', abstract='protein', posted_by=member)
+    upload = UploadSession.objects.create(user=member, target='user_file', filename='bench.bin', size=1024,
+                                          chunk_size=1024)
+
+    return {
+        'users': {'admin': admin, 'member': member, 'other': other},
+        'refresh': str(RefreshToken.for_user(member)),
+        'project': project.pk,
+        'no_profile_project': no_profile_project.pk,
+        'pending_project': pending_project.pk,
+        'document': document.pk,
+        'deletion_request': deletion_request.pk,
+        'user_file': user_file.pk,
+        'publication': publication.pk,
+        'upload': upload.pk,
+        'member_id': member.pk,
+        'other_id': other.pk,
+        'no_profile_id': no_profile.pk,
+    }
+
+
+def _complete_upload(fx):
+    from django.core.files.storage import default_storage
+
+    session = UploadSession.objects.create(user=fx['users']['member'], target='user_file', filename='bench.bin',
+                                           size=1024, chunk_size=1024, received_chunks=[0])
+    default_storage.save(session.temp_name, ContentFile(os.urandom(1024)))
+    return {'session': session.pk}
+
+
+def _pending_request(fx):
+    ProjectDeletionRequest.objects.filter(pk=fx['deletion_request']).update(status='pending')
+    return {}
+
+
+def _render_public_feed(fx):
+    from .. import public_feed
+
+    # Serialize instead of answering from the cache
+    public_feed.invalidate()
+    return {}
+
+
+def _profile_created(fx):
+    # ExtendedUserSerializer gives profile-less users a profile, under WSGI
+    # and ASGI alike
+    if not UserProfile.objects.filter(user_id=fx['no_profile_id']).exists():
+        return 'no profile created for a profile-less project creator'
+    return None
+
+
+def _upload_file(name='bench.txt', size=16 * 1024):
+    return SimpleUploadedFile(name, os.urandom(size), content_type='application/octet-stream')
+
+
+def scenarios():
+    return [
+        Scenario('api-root', 'get', '/api/', user='member'),
+        Scenario('token_obtain_pair', 'post', '/api/token/',
+                 data={'username': 'bench_member', 'password': PASSWORD}, format='json'),
+        Scenario('token_obtain_pair_email', 'post', '/api/token/email/',
+                 data={'email': 'bench_member@example.org', 'password': PASSWORD}, format='json'),
+        Scenario('token_refresh', 'post', '/api/token/refresh/', data=lambda fx: {'refresh': fx['refresh']},
+                 format='json'),
+        Scenario('update_user_role', 'post', '/api/admin/update-user-role/{other_id}/', user='admin',
+                 data={'role': 'member'}, format='json'),
+        Scenario('admin-profiles', 'get', '/api/admin/profiles/', user='admin'),
+        Scenario('current-user', 'get', '/api/user/', user='member'),
+        Scenario('user-profile', 'get', '/api/user/profile/', user='member'),
+        Scenario('user-profile', 'put', '/api/user/profile/', user='member', data={'bio': 'Benchmark'},
+                 format='json'),
+        Scenario('site-content', 'get', '/api/site-content/', user='member'),
+        Scenario('site-content', 'put', '/api/site-content/', user='admin', data={'footer_team_name': 'Lab'},
+                 format='json'),
+        Scenario('team-members', 'get', '/api/team-members/'),
+        Scenario('team-member-detail', 'get', '/api/team-members/{member_id}/'),
+        Scenario('search', 'get', '/api/search/?q=protein+kinase'),
+        Scenario('metrics', 'get', '/metrics'),
+        Scenario('file-list', 'get', '/api/files', user='member'),
+        Scenario('file-list', 'post', '/api/files', user='member',
+                 data=lambda fx: {'name': 'bench.txt', 'file': _upload_file()}, format='multipart',
+                 expected_status=201),
+        Scenario('file-detail', 'get', '/api/files/{user_file}', user='member'),
+        Scenario('file-download', 'get', '/api/files/{user_file}/download', user='other'),
+        Scenario('publication-list', 'get', '/api/publications'),
+        Scenario('publication-list', 'post', '/api/publications', user='member',
+                 data={'title': 'Benchmark', 'abstract': 'Benchmark'}, format='json', expected_status=201),
+        Scenario('publication-detail', 'get', '/api/publications/{publication}'),
+        Scenario('project-list', 'get', '/api/projects', user='member'),
+        Scenario('project-list', 'get', '/api/projects?page_size=50', user='member'),
+        Scenario('project-list', 'post', '/api/projects', user='member',
+                 data={'title': 'Benchmark', 'description': 'Benchmark'}, format='multipart',
+                 expected_status=201),
+        Scenario('project-public', 'get', '/api/projects/public'),
+        Scenario('project-public', 'get', '/api/projects/public?ids={no_profile_project}',
+                 prepare=_render_public_feed, check=_profile_created),
+        Scenario('project-stats', 'get', '/api/projects/stats', user='admin'),
+        Scenario('project-detail', 'get', '/api/projects/{project}', user='member'),
+        Scenario('project-detail', 'patch', '/api/projects/{project}', user='member',
+                 data={'description': 'Updated'}, format='multipart'),
+        Scenario('project-add-member', 'post', '/api/projects/{project}/add_member', user='member',
+                 data=lambda fx: {'user_id': fx['other_id']}, format='json'),
+        Scenario('project-remove-member', 'post', '/api/projects/{project}/remove_member', user='member',
+                 data=lambda fx: {'user_id': fx['other_id']}, format='json'),
+        Scenario('project-request-deletion', 'post', '/api/projects/{project}/request_deletion', user='member',
+                 data={'reason': 'Benchmark'}, format='json', expected_status=201),
+        Scenario('project-document-list', 'get', '/api/project-documents', user='member'),
+        Scenario('project-document-list', 'post', '/api/project-documents', user='member',
+                 data=lambda fx: {'project': fx['project'], 'name': 'bench.txt', 'file_type': 'document',
+                                  'file': _upload_file()}, format='multipart', expected_status=201),
+        Scenario('project-document-bulk-upload', 'post', '/api/project-documents/bulk_upload', user='member',
+                 data=lambda fx: {'project': fx['project'],
+                                  'files': [_upload_file(f'bench_{i}.txt') for i in range(5)]},
+                 format='multipart', expected_status=201),
+        Scenario('project-document-by-project', 'get', '/api/project-documents/by_project?project_id={project}',
+                 user='member'),
+        Scenario('project-document-detail', 'get', '/api/project-documents/{document}', user='member'),
+        Scenario('project-document-download', 'get', '/api/project-documents/{document}/download', user='member'),
+        Scenario('project-deletion-request-list', 'get', '/api/project-deletion-requests', user='admin'),
+        Scenario('project-deletion-request-detail', 'get', '/api/project-deletion-requests/{deletion_request}',
+                 user='admin'),
+        Scenario('project-deletion-request-approve', 'post',
+                 '/api/project-deletion-requests/{deletion_request}/approve', user='admin', prepare=_pending_request),
+        Scenario('project-deletion-request-reject', 'post',
+                 '/api/project-deletion-requests/{deletion_request}/reject', user='admin', prepare=_pending_request),
+        Scenario('upload-list', 'post', '/api/uploads', user='member',
+                 data={'target': 'user_file', 'filename': 'bench.bin', 'size': 1024}, format='json',
+                 expected_status=201),
+        Scenario('upload-detail', 'get', '/api/uploads/{upload}', user='member'),
+        Scenario('upload-chunk', 'put', '/api/uploads/{upload}/chunks/0', user='member',
+                 data=lambda fx: os.urandom(1024), content_type='application/octet-stream'),
+        Scenario('upload-complete', 'post', '/api/uploads/{session}/complete', user='member',
+                 prepare=_complete_upload, expected_status=201),
+    ]
+
+
+class Runner:
+    def __init__(self, fixtures, asgi=False):
+        self.fixtures = fixtures
+        self.asgi = asgi
+        # Real bearer tokens, so authentication is part of what is measured
+        self.tokens = {name: f'Bearer {RefreshToken.for_user(user).access_token}'
+                       for name, user in fixtures['users'].items()}
+        # Server errors are reported as 500s instead of aborting the run
+        self.async_client = AsyncClient(raise_request_exception=False)
+        self.clients = {None: APIClient(SERVER_NAME='localhost', raise_request_exception=False)}
+        for name, token in self.tokens.items():
+            client = APIClient(SERVER_NAME='localhost', raise_request_exception=False)
+            client.credentials(HTTP_AUTHORIZATION=token)
+            self.clients[name] = client
+
+    def run(self, scenario, iterations, warmup=1):
+        result = Result(scenario)
+        for iteration in range(warmup + iterations):
+            status_code, elapsed, queries, size, problem = self._request(scenario)
+            if problem:
+                result.problems.add(problem)
+            if iteration >= warmup:
+                result.status_codes.add(status_code)
+                result.timings.append(elapsed)
+                result.queries.append(queries)
+                result.sizes.append(size)
+        return result
+
+    def _request(self, scenario):
+        client = self.clients[scenario.user]
+        with transaction.atomic():
+            values = dict(self.fixtures)
+            if scenario.prepare is not None:
+                values.update(scenario.prepare(self.fixtures))
+            path = scenario.path.format(**values)
+            data = scenario.data(values) if callable(scenario.data) else scenario.data
+            kwargs = {'format': scenario.format} if scenario.format else {}
+            if scenario.content_type:
+                kwargs['content_type'] = scenario.content_type
+
+            queries = []
+            with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+                start = time.perf_counter()
+                if self.asgi:
+                    # The ORM calls of the async views come back to this thread (and connection)
+                    status_code, size = async_to_sync(self._asgi_request)(scenario, path, data)
+                else:
+                    response = getattr(client, scenario.method)(path, data, **kwargs)
+                    status_code = response.status_code
+                    if response.streaming:
+                        size = sum(len(chunk) for chunk in response.streaming_content)
+                    else:
+                        size = len(response.content)
+                elapsed = (time.perf_counter() - start) * 1000
+            problem = scenario.check(values) if scenario.check is not None else None
+            transaction.set_rollback(True)
+        return status_code, elapsed, len(queries), size, problem
+
+    async def _asgi_request(self, scenario, path, data):
+        headers = {}
+        if scenario.user is not None:
+            headers['Authorization'] = self.tokens[scenario.user]
+        kwargs = {'headers': headers}
+        if scenario.format == 'json':
+            data, kwargs['content_type'] = json.dumps(data), 'application/json'
+        elif scenario.format == 'multipart':
+            # Encoded here since the client only encodes POST bodies (and only for its own constant)
+            data, kwargs['content_type'] = encode_multipart(BOUNDARY, data), f'multipart/form-data; boundary={BOUNDARY}'
+        elif scenario.content_type:
+            kwargs['content_type'] = scenario.content_type
+
+        response = await getattr(self.async_client, scenario.method)(path, data, **kwargs)
+        if not response.streaming:
+            return response.status_code, len(response.content)
+        if response.is_async:
+            return response.status_code, sum([len(chunk) async for chunk in response.streaming_content])
+        return response.status_code, sum(len(chunk) for chunk in response.streaming_content)
+
+
+def compare(current, baseline, max_query_increase=0, max_latency_ratio=0.5, min_latency_delta_ms=5.0):
+    """Return the regressions of `current` against `baseline` as readable strings"""
+    regressions = []
+    for key, now in current.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        if now['queries'] > before['queries'] + max_query_increase:
+            regressions.append(f"{key}: {now['queries']} queries (baseline {before['queries']})")
+        limit = before['p95_ms'] * (1 + max_latency_ratio)
+        if now['p95_ms'] > limit and now['p95_ms'] - before['p95_ms'] > min_latency_delta_ms:
+            regressions.append(f"{key}: p95 {now['p95_ms']} ms (baseline {before['p95_ms']} ms)")
+    return regressions
@@ -0,0 +1,157 @@
+"""
+Synthetic data for the benchmark commands.
+
+Rows are written with bulk_create in batches, so model signals do not run;
+the read models they maintain (team directory, search index, project
+stats) are rebuilt explicitly at the end when asked to. Stored file names point to files that
+do not exist, which the serializers already tolerate.
+"""
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import (Project, ProjectDeletionRequest, ProjectDocument, Publication, TeamDirectoryEntry,
+                      UserFile, UserProfile)
+
+WORDS = ('protein membrane kinase enzyme catalysis structure folding ligand binding assay microscopy '
+         'spectroscopy crystal lattice synthesis polymer genome sequence cell culture signal pathway '
+         'receptor inhibitor solvent reaction model simulation dataset analysis imaging sample').split()
+
+
+@dataclass
+class Scale:
+    users: int = 100
+    projects: int = 1000
+    documents_per_project: int = 3
+    members_per_project: int = 3
+    publications: int = 1000
+    user_files: int = 1000
+    # One project in `deletion_request_every` gets a deletion request
+    deletion_request_every: int = 10
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _spread(rng, count, days=3 * 365):
+    """Distinct-ish timestamps over the last `days` days"""
+    now = timezone.now()
+    return [now - timedelta(seconds=rng.randrange(days * 24 * 3600)) for _ in range(count)]
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _bulk_create(model, objects, batch_size):
+    created = []
+    for batch in _batches(objects, batch_size):
+        created.extend(model.objects.bulk_create(batch))
+    return created
+
+
+def _restore_timestamps(model, field, pks, values, batch_size):
+    """auto_now_add overwrites bulk_create values, so spread them afterwards"""
+    objects = [model(pk=pk, **{field: value}) for pk, value in zip(pks, values)]
+    for batch in _batches(objects, batch_size):
+        model.objects.bulk_update(batch, [field])
+
+
+def seed(scale, seed=0, batch_size=1000, rebuild_read_models=True, stdout=None):
+    """Fill the database with `scale` worth of users, projects, documents and publications"""
+    rng = random.Random(seed)
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    with transaction.atomic():
+        log(f'Seeding {scale.users} users')
+        password = make_password('benchmark')
+        first = User.objects.count()
+        users = _bulk_create(User, [
+            User(username=f'bench{first + i}', email=f'bench{first + i}@example.org', password=password,
+                 first_name=rng.choice(WORDS).title(), last_name=rng.choice(WORDS).title())
+            for i in range(scale.users)
+        ], batch_size)
+        users = list(User.objects.filter(username__in=[u.username for u in users]).order_by('pk'))
+        _bulk_create(UserProfile, [
+            UserProfile(user=user, role=rng.choice(['member'] * 8 + ['chef_d_equipe', 'admin']),
+                        institution=rng.choice(['CNRS', 'INSERM', 'Université', 'CEA']), bio=_text(rng, 20))
+            for user in users
+        ], batch_size)
+
+        log(f'Seeding {scale.projects} projects')
+        projects = _bulk_create(Project, [
+            Project(title=_text(rng, 4), description=_text(rng, 60), objectives=_text(rng, 20),
+                    methodology=_text(rng, 20), results=_text(rng, 20), created_by=rng.choice(users),
+                    is_validated=rng.random() < 0.7)
+            for _ in range(scale.projects)
+        ], batch_size)
+        project_ids = list(Project.objects.order_by('-pk').values_list('pk', flat=True)[:scale.projects])
+        _restore_timestamps(Project, 'created_at', project_ids, _spread(rng, len(project_ids)), batch_size)
+
+        Membership = Project.members.through
+        _bulk_create(Membership, [
+            Membership(project_id=project_id, user_id=user.pk)
+            for project_id in project_ids
+            for user in rng.sample(users, min(scale.members_per_project, len(users)))
+        ], batch_size)
+
+        log(f'Seeding {scale.projects * scale.documents_per_project} documents')
+        documents = []
+        for project_id in project_ids:
+            for _ in range(scale.documents_per_project):
+                name = f'{rng.choice(WORDS)}_{rng.randrange(10 ** 6)}.{rng.choice(["pdf", "png", "docx"])}'
+                documents.append(ProjectDocument(project_id=project_id, file=f'project_files/{name}', name=name,
+                                                 description=_text(rng, 10), uploaded_by=rng.choice(users),
+                                                 size=rng.randrange(10 ** 7)))
+        _bulk_create(ProjectDocument, documents, batch_size)
+        document_ids = list(ProjectDocument.objects.order_by('-pk').values_list('pk', flat=True)[:len(documents)])
+        _restore_timestamps(ProjectDocument, 'uploaded_at', document_ids, _spread(rng, len(document_ids)), batch_size)
+
+        _bulk_create(ProjectDeletionRequest, [
+            ProjectDeletionRequest(project_id=project_id, requested_by=rng.choice(users), reason=_text(rng, 8),
+                                   status=rng.choice(['pending', 'approved', 'rejected']))
+            for project_id in project_ids[::max(scale.deletion_request_every, 1)]
+        ], batch_size)
+
+        log(f'Seeding {scale.publications} publications and {scale.user_files} user files')
+        _bulk_create(Publication, [
+            Publication(title=_text(rng, 8), abstract=_text(rng, 80), posted_by=rng.choice(users))
+            for _ in range(scale.publications)
+        ], batch_size)
+        publication_ids = list(Publication.objects.order_by('-pk').values_list('pk', flat=True)[:scale.publications])
+        _restore_timestamps(Publication, 'posted_at', publication_ids, _spread(rng, len(publication_ids)), batch_size)
+
+        _bulk_create(UserFile, [
+            UserFile(file=f'user_files/file_{i}.pdf', name=f'file_{i}.pdf', uploaded_by=rng.choice(users),
+                     file_type='application/pdf', size=rng.randrange(10 ** 7))
+            for i in range(scale.user_files)
+        ], batch_size)
+        file_ids = list(UserFile.objects.order_by('-pk').values_list('pk', flat=True)[:scale.user_files])
+        _restore_timestamps(UserFile, 'uploaded_at', file_ids, _spread(rng, len(file_ids)), batch_size)
+
+    if rebuild_read_models:
+        from .. import project_stats, search, team_directory
+
+        log('Rebuilding the team directory, search index and project stats')
+        team_directory.rebuild()
+        search.rebuild()
+        project_stats.rebuild()
+
+    return {
+        'users': len(users),
+        'projects': len(project_ids),
+        'documents': len(documents),
+        'publications': scale.publications,
+        'user_files': scale.user_files,
+        'directory_entries': TeamDirectoryEntry.objects.count(),
+    }
@@ -0,0 +1,71 @@
+"""
+Bulk ingestion of project documents.
+
+File bodies are written to storage concurrently on a bounded thread pool
+(storage writes release the GIL), then the metadata rows are inserted with a
+single bulk_create inside one transaction.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+
+from .models import ProjectDocument
+
+
+def _store(project, user, file_obj):
+    # bulk_create skips pre_save, where the size is normally recorded
+    document = ProjectDocument(project=project, name=file_obj.name, uploaded_by=user, size=file_obj.size)
+    try:
+        document.file.save(file_obj.name, file_obj, save=False)
+    finally:
+        # Storage backends may query the database from this worker thread
+        connection.close()
+    # Auto-detect file type
+    document.file_type = 'image' if document.is_image else 'document'
+    return document
+
+
+def ingest_documents(project, user, files):
+    """
+    Store `files` and create their ProjectDocument rows.
+
+    Returns a list with one (file_obj, document, error) entry per file, in
+    the order the files were given; exactly one of document/error is set.
+    """
+    max_workers = max(1, min(getattr(settings, 'BULK_UPLOAD_MAX_WORKERS', 4), len(files)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_store, project, user, file_obj) for file_obj in files]
+
+    results = []
+    for file_obj, future in zip(files, futures):
+        try:
+            results.append([file_obj, future.result(), None])
+        except Exception as e:
+            results.append([file_obj, None, str(e)])
+
+    documents = [result[1] for result in results if result[1] is not None]
+    if not documents:
+        return results
+
+    try:
+        with transaction.atomic():
+            ProjectDocument.objects.bulk_create(documents)
+            if any(document.pk is None for document in documents):
+                # Backends without INSERT ... RETURNING (MySQL) do not set pks
+                ids = dict(ProjectDocument.objects.filter(
+                    project=project, file__in=[document.file.name for document in documents]
+                ).values_list('file', 'id'))
+                for document in documents:
+                    document.pk = ids.get(document.file.name)
+            # bulk_create skips signals; send them so cache and index receivers run
+            for document in documents:
+                post_save.send(sender=ProjectDocument, instance=document, created=True,
+                               update_fields=None, raw=False, using=document._state.db)
+    except Exception as e:
+        for result in results:
+            if result[1] is not None:
+                result[1].file.delete(save=False)
+                result[1], result[2] = None, str(e)
+    return results
@@ -0,0 +1,176 @@
+"""
+Thumbnail and preview generation for project images and documents.
+
+After a Project or ProjectDocument is saved with a new file, a background
+thread renders a THUMBNAIL_SIZE and a PREVIEW_SIZE WebP next to the
+original: the image itself, or the first page of a PDF. PDF rendering uses
+PyMuPDF when installed and falls back to poppler's `pdftoppm`; without
+either, PDFs simply get no derivatives. Run `manage.py generate_derivatives`
+to backfill existing files.
+"""
+import io
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Project, ProjectDocument
+from .storage import ContentAddressedStorage
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp')
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'DERIVATIVE_WORKERS', 2),
+            thread_name_prefix='derivatives',
+        )
+    return _executor
+
+
+def derivative_url(request, fieldfile):
+    """Absolute URL of a derivative, like DRF renders FileFields"""
+    if not fieldfile:
+        return None
+    url = fieldfile.url
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def source_file(instance):
+    return instance.image if isinstance(instance, Project) else instance.file
+
+
+def needs_derivatives(instance):
+    source = source_file(instance)
+    return bool(source) and source.name != instance.derivatives_source
+
+
+def schedule(instance):
+    """Generate the derivatives of `instance` on the background pool"""
+    _get_executor().submit(_run, type(instance), instance.pk)
+
+
+def _run(model, pk):
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        if instance is not None and needs_derivatives(instance):
+            generate(instance)
+    except Exception:
+        logger.exception("Could not generate derivatives for %s %s", model.__name__, pk)
+    finally:
+        connection.close()
+
+
+def generate(instance):
+    """Render and store the thumbnail and preview of `instance`"""
+    source = source_file(instance)
+    image = _render_source(source)
+
+    thumbnail = preview = None
+    if image is not None:
+        base = os.path.splitext(source.name)[0]
+        preview = _save_webp(source.storage, image, getattr(settings, 'PREVIEW_SIZE', 1024), base + '.preview.webp')
+        thumbnail = _save_webp(source.storage, image, getattr(settings, 'THUMBNAIL_SIZE', 320), base + '.thumb.webp')
+
+    # Replace the previous derivatives, if any. Content-addressed storage
+    # hands out the same name for the same bytes but counts a new reference.
+    for old in (instance.thumbnail, instance.preview):
+        if old and (old.name not in (thumbnail, preview) or isinstance(old.storage, ContentAddressedStorage)):
+            old.storage.delete(old.name)
+
+    # update() skips post_save, so this does not schedule another run
+    type(instance).objects.filter(pk=instance.pk).update(
+        thumbnail=thumbnail, preview=preview, derivatives_source=source.name
+    )
+
+    from . import public_feed
+    public_feed.invalidate()
+
+
+def _render_source(source):
+    """Return a PIL image of the file (first page for PDFs), or None"""
+    from PIL import Image, ImageOps
+
+    extension = os.path.splitext(source.name)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        with source.open('rb') as f:
+            image = Image.open(f)
+            image.load()
+        return ImageOps.exif_transpose(image)
+    if extension == '.pdf':
+        return _render_pdf_page(source)
+    return None
+
+
+def _render_pdf_page(source):
+    from PIL import Image
+
+    size = getattr(settings, 'PREVIEW_SIZE', 1024)
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        fitz = None
+
+    if fitz is not None:
+        with source.open('rb') as f:
+            document = fitz.open(stream=f.read(), filetype='pdf')
+        if document.page_count == 0:
+            return None
+        page = document.load_page(0)
+        zoom = size / max(page.rect.width, page.rect.height)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+        return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+    if shutil.which('pdftoppm') is None:
+        return None
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, 'page')
+        subprocess.run(
+            ['pdftoppm', '-png', '-singlefile', '-f', '1', '-l', '1', '-scale-to', str(size),
+             source.path, output],
+            check=True, timeout=60, capture_output=True,
+        )
+        with Image.open(output + '.png') as image:
+            image.load()
+            return image.copy()
+
+
+def _save_webp(storage, image, size, name):
+    image = image.copy()
+    image.thumbnail((size, size))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format='WEBP', quality=80)
+    return storage.save(name, ContentFile(buffer.getvalue()))
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=ProjectDocument)
+def schedule_derivatives(sender, instance, raw=False, **kwargs):
+    if raw or not getattr(settings, 'DERIVATIVES_ENABLED', True):
+        return
+    if needs_derivatives(instance):
+        transaction.on_commit(lambda: schedule(instance))
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=ProjectDocument)
+def delete_derivatives(sender, instance, **kwargs):
+    for fieldfile in (instance.thumbnail, instance.preview):
+        if fieldfile:
+            fieldfile.storage.delete(fieldfile.name)
@@ -5,8 +5,14 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
+from .throttles import LOGIN_THROTTLES
+
+class UsernameTokenObtainPairView(TokenObtainPairView):
+    throttle_classes = LOGIN_THROTTLES
+
 class EmailTokenObtainPairView(TokenObtainPairView):
-    serializer_class = EmailTokenObtainPairSerializer 
+    serializer_class = EmailTokenObtainPairSerializer
+    throttle_classes = LOGIN_THROTTLES
 
 class GoogleLoginJWTView(APIView):
     permission_classes = [IsAuthenticated]
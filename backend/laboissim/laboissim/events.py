@@ -0,0 +1,317 @@
+"""
+Change events for projects, project documents and deletion requests,
+streamed to browsers by /api/events/ (server-sent events).
+
+Saving or deleting one of those models appends a ChangeEvent row once the
+transaction commits. The row id is the SSE event id, so a client that
+reconnects with Last-Event-ID gets what it missed from the table, whichever
+worker it lands on. Rows older than EVENTS_RETENTION_HOURS are pruned.
+
+Under ASGI each event loop runs one Broker: a single task reads the new
+rows (every EVENTS_POLL_INTERVAL seconds, or at once when this process
+committed the change) and fans them out to the open streams, so the number
+of queries does not grow with the number of clients. Under WSGI each
+stream polls the table itself and ends after EVENTS_WSGI_MAX_SECONDS to
+give its thread back; EventSource reconnects on its own.
+
+Events carry ids only ({"kind", "action", "id", "project_id"}); clients
+fetch the changed object from the regular endpoints, which apply the
+usual permissions.
+"""
+import asyncio
+import json
+import threading
+import time
+import weakref
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ChangeEvent, Project, ProjectDeletionRequest, ProjectDocument
+
+KIND_BY_MODEL = {Project: 'project', ProjectDocument: 'document', ProjectDeletionRequest: 'deletion_request'}
+
+# Ids allocated but not committed yet show up as gaps; wait this long for them
+GAP_TIMEOUT = 5
+FETCH_SIZE = 500
+PRUNE_EVERY = 1000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# Recording
+
+def record(kind, action, object_id, project_id=None, is_public=False, owner_id=None):
+    event = ChangeEvent.objects.create(kind=kind, action=action, object_id=object_id, project_id=project_id,
+                                       is_public=is_public, owner_id=owner_id)
+    if event.pk % PRUNE_EVERY == 0:
+        prune()
+    notify()
+    return event
+
+
+def prune():
+    cutoff = timezone.now() - timedelta(hours=_setting('EVENTS_RETENTION_HOURS', 24))
+    return ChangeEvent.objects.filter(created_at__lt=cutoff).delete()[0]
+
+
+def _describe(instance):
+    """(project_id, is_public, owner_id) of a changed object"""
+    if isinstance(instance, Project):
+        return instance.pk, instance.is_validated, None
+    if isinstance(instance, ProjectDocument):
+        try:
+            is_public = instance.project.is_validated
+        except Project.DoesNotExist:
+            is_public = False
+        return instance.project_id, is_public, None
+    return instance.project_id, False, instance.requested_by_id
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=ProjectDocument)
+@receiver(post_save, sender=ProjectDeletionRequest)
+def record_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    project_id, is_public, owner_id = _describe(instance)
+    action = 'created' if created else 'updated'
+    # After commit, so the event is never seen before the change it announces
+    transaction.on_commit(lambda: record(KIND_BY_MODEL[sender], action, instance.pk, project_id, is_public, owner_id))
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=ProjectDocument)
+@receiver(post_delete, sender=ProjectDeletionRequest)
+def record_delete(sender, instance, **kwargs):
+    project_id, is_public, owner_id = _describe(instance)
+    object_id = instance.pk
+    transaction.on_commit(lambda: record(KIND_BY_MODEL[sender], 'deleted', object_id, project_id, is_public, owner_id))
+
+
+# Reading
+
+class Audience:
+    """Who a stream is for, decided once when it opens"""
+
+    def __init__(self, user):
+        from .permission_context import get_permission_context
+
+        self.user_id = user.pk if user.is_authenticated else None
+        self.is_admin = self.user_id is not None and (
+            user.is_staff or user.is_superuser or get_permission_context(user).is_admin)
+
+    def can_see(self, event):
+        if event.kind == 'deletion_request':
+            return self.is_admin or (self.user_id is not None and event.owner_id == self.user_id)
+        return event.is_public or self.user_id is not None
+
+
+def format_event(event):
+    data = {'kind': event.kind, 'action': event.action, 'id': event.object_id, 'project_id': event.project_id}
+    return f'id: {event.pk}\nevent: {event.kind}\ndata: {json.dumps(data)}\n\n'
+
+
+# Sent when the events after Last-Event-ID are no longer all available
+RESET = 'event: reset\ndata: {}\n\n'
+
+
+class Cursor:
+    """
+    Position in the event table that does not skip rows committed out of id
+    order: a gap holds the cursor back until it is filled or GAP_TIMEOUT
+    passes (rolled back inserts leave permanent gaps).
+    """
+
+    def __init__(self, position):
+        self.position = position
+        self.delivered = set()
+        self.gaps = {}
+
+    def accept(self, events):
+        """The events not delivered yet, in id order; advances the cursor"""
+        now = time.monotonic()
+        fresh = []
+        previous = max([self.position, *self.delivered])
+        for event in events:
+            if event.pk in self.delivered:
+                continue
+            self.gaps.pop(event.pk, None)
+            for missing in range(previous + 1, event.pk):
+                self.gaps.setdefault(missing, now)
+            previous = max(previous, event.pk)
+            self.delivered.add(event.pk)
+            fresh.append(event)
+
+        self.gaps = {pk: seen for pk, seen in self.gaps.items() if now - seen < GAP_TIMEOUT}
+        highest = max([self.position, *self.delivered])
+        self.position = min(self.gaps) - 1 if self.gaps else highest
+        self.delivered = {pk for pk in self.delivered if pk > self.position}
+        return fresh
+
+    def queryset(self):
+        return ChangeEvent.objects.filter(pk__gt=self.position).order_by('pk')[:FETCH_SIZE]
+
+
+def latest_id():
+    return ChangeEvent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def replay(last_event_id):
+    """
+    The events after `last_event_id`, and whether the client must reload
+    instead (they were pruned, or are more than EVENTS_REPLAY_LIMIT)
+    """
+    limit = _setting('EVENTS_REPLAY_LIMIT', 1000)
+    oldest = ChangeEvent.objects.order_by('pk').values_list('pk', flat=True).first()
+    events = list(ChangeEvent.objects.filter(pk__gt=last_event_id).order_by('pk')[:limit + 1])
+    reset = (oldest is not None and last_event_id < oldest - 1) or len(events) > limit
+    return events[:limit], reset
+
+
+# ASGI: one broker per event loop
+
+class Subscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=_setting('EVENTS_QUEUE_SIZE', 1000))
+        # Set when the client fell too far behind; its stream then ends and
+        # the client catches up from the table with Last-Event-ID
+        self.overflowed = False
+
+
+class Broker:
+    def __init__(self, loop):
+        self.loop = loop
+        self.subscribers = set()
+        self.wakeup = asyncio.Event()
+        self.lock = asyncio.Lock()
+        self.cursor = None
+        self.task = None
+
+    async def subscribe(self):
+        """
+        A subscriber gets every event committed after it subscribed (and
+        maybe a few from just before)
+        """
+        async with self.lock:
+            if self.task is None or self.task.done():
+                self.cursor = Cursor(await sync_to_async(latest_id)())
+                self.task = self.loop.create_task(self._run())
+            subscriber = Subscriber()
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def notify(self):
+        self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    async def _run(self):
+        cursor = self.cursor
+        interval = _setting('EVENTS_POLL_INTERVAL', 1.0)
+        while self.subscribers:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            events = [event async for event in cursor.queryset()]
+            for event in cursor.accept(events):
+                for subscriber in list(self.subscribers):
+                    try:
+                        subscriber.queue.put_nowait(event)
+                    except asyncio.QueueFull:
+                        subscriber.overflowed = True
+                        self.subscribers.discard(subscriber)
+
+
+_brokers = weakref.WeakKeyDictionary()
+_brokers_lock = threading.Lock()
+
+
+def get_broker():
+    loop = asyncio.get_running_loop()
+    with _brokers_lock:
+        broker = _brokers.get(loop)
+        if broker is None:
+            broker = _brokers[loop] = Broker(loop)
+    return broker
+
+
+def notify():
+    """Wake this process's brokers up, from any thread"""
+    with _brokers_lock:
+        brokers = list(_brokers.values())
+    for broker in brokers:
+        if not broker.loop.is_closed():
+            broker.notify()
+
+
+async def stream(audience, last_event_id=None):
+    """Async SSE body: replay after `last_event_id`, then live events"""
+    broker = get_broker()
+    # Subscribed before the replay, so nothing falls between the two
+    subscriber = await broker.subscribe()
+    heartbeat = _setting('EVENTS_HEARTBEAT_SECONDS', 15)
+    try:
+        yield f"retry: {_setting('EVENTS_RETRY_MS', 3000)}\n\n"
+        last = last_event_id
+        if last is not None:
+            events, reset = await sync_to_async(replay)(last)
+            if reset:
+                yield RESET
+            for event in events:
+                last = event.pk
+                if audience.can_see(event):
+                    yield format_event(event)
+        while not subscriber.overflowed:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if last is not None and event.pk <= last:
+                continue  # already replayed
+            if audience.can_see(event):
+                yield format_event(event)
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+def sync_stream(audience, last_event_id=None):
+    """WSGI SSE body: polls the table and ends after EVENTS_WSGI_MAX_SECONDS"""
+    deadline = time.monotonic() + _setting('EVENTS_WSGI_MAX_SECONDS', 30)
+    interval = _setting('EVENTS_POLL_INTERVAL', 1.0)
+    heartbeat = _setting('EVENTS_HEARTBEAT_SECONDS', 15)
+    yield f"retry: {_setting('EVENTS_RETRY_MS', 3000)}\n\n"
+    if last_event_id is None:
+        cursor = Cursor(latest_id())
+    else:
+        events, reset = replay(last_event_id)
+        if reset:
+            yield RESET
+        cursor = Cursor(events[-1].pk if events else last_event_id)
+        for event in events:
+            if audience.can_see(event):
+                yield format_event(event)
+
+    last_sent = time.monotonic()
+    while True:
+        for event in cursor.accept(list(cursor.queryset())):
+            if audience.can_see(event):
+                last_sent = time.monotonic()
+                yield format_event(event)
+        if time.monotonic() >= deadline:
+            return
+        if time.monotonic() - last_sent >= heartbeat:
+            last_sent = time.monotonic()
+            yield ': keep-alive\n\n'
+        time.sleep(interval)
@@ -0,0 +1,59 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import events
+from .authentication import CachedJWTAuthentication
+
+
+class EventStreamView(View):
+    """
+    GET /api/events/[?token=<access token>]
+
+    Server-sent events announcing changes to projects, project documents
+    and deletion requests (see events.py). EventSource cannot send headers,
+    so the JWT access token may be given as ?token=; the Authorization
+    header and the session cookie work as well. Anonymous clients only get
+    the events of validated projects; deletion requests are sent to admins
+    and to their author.
+    """
+
+    async def get(self, request):
+        try:
+            user = await sync_to_async(self.authenticate)(request)
+        except exceptions.AuthenticationFailed as exc:
+            data = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+            response = JsonResponse(data, status=401)
+            response['WWW-Authenticate'] = CachedJWTAuthentication().authenticate_header(request)
+            return response
+        audience = await sync_to_async(events.Audience)(user)
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
+
+        if isinstance(request, ASGIRequest):
+            body = events.stream(audience, last_event_id)
+        else:
+            # Under WSGI the stream holds a worker thread, so it is time-boxed
+            body = events.sync_stream(audience, last_event_id)
+        response = StreamingHttpResponse(body, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Keep nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def authenticate(self, request):
+        token = request.GET.get('token')
+        if token:
+            authentication = CachedJWTAuthentication()
+            return authentication.get_user(authentication.get_validated_token(token))
+        drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+        return drf_request.user or AnonymousUser()
@@ -0,0 +1,60 @@
+"""
+Storage cleanup for the uploaded files of every model.
+
+When a row is deleted (directly, by a queryset delete or by a cascade), or
+one of its files is replaced or cleared, the old file is deleted through
+its storage once the transaction commits. With ContentAddressedStorage that
+drops one reference to the blob rather than the file itself.
+
+Thumbnails and previews are not editable fields; derivatives.py manages
+those.
+"""
+from django.db import transaction
+from django.db.models import FileField
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Project, ProjectDocument, UserFile, UserProfile
+
+
+def file_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, FileField) and field.editable]
+
+
+def _delete_on_commit(storage, name):
+    transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(pre_save, sender=Project)
+@receiver(pre_save, sender=ProjectDocument)
+@receiver(pre_save, sender=UserFile)
+@receiver(pre_save, sender=UserProfile)
+def delete_replaced_files(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    fields = [field for field in file_fields(sender) if update_fields is None or field.name in update_fields]
+    if not fields:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list(*[field.attname for field in fields]).first()
+    if previous is None:
+        return
+    for field, old_name in zip(fields, previous):
+        if not old_name:
+            continue
+        fieldfile = getattr(instance, field.attname)
+        # A new upload is not committed yet; a committed file may have been
+        # pointed at another stored name
+        if not fieldfile or not fieldfile._committed or fieldfile.name != old_name:
+            _delete_on_commit(field.storage, old_name)
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=ProjectDocument)
+@receiver(post_delete, sender=UserFile)
+@receiver(post_delete, sender=UserProfile)
+def delete_files(sender, instance, **kwargs):
+    for field in file_fields(sender):
+        fieldfile = getattr(instance, field.attname)
+        if fieldfile:
+            _delete_on_commit(fieldfile.storage, fieldfile.name)
+
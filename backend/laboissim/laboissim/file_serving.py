@@ -0,0 +1,137 @@
+"""
+File downloads for project documents and user files.
+
+FILE_DOWNLOAD_BACKEND selects how the bytes are sent once the view has done
+its permission checks:
+
+- 'django' (default): served by the worker, with ETag/Last-Modified
+  validation and single-range `Range`/`If-Range` support.
+- 'x-accel-redirect': nginx serves the file from an internal location
+  mapped to FILE_DOWNLOAD_ACCEL_PREFIX.
+- 'x-sendfile': Apache/lighttpd mod_xsendfile serves the absolute path.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def serve_file(request, path, filename=None, as_attachment=False):
+    """Return a response sending the file at the absolute `path`"""
+    if not os.path.isfile(path):
+        raise Http404('File not found')
+
+    filename = filename or os.path.basename(path)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    backend = getattr(settings, 'FILE_DOWNLOAD_BACKEND', 'django')
+
+    if backend == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        relative_path = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = settings.FILE_DOWNLOAD_ACCEL_PREFIX + quote(relative_path)
+    elif backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = _direct_response(request, path, content_type)
+
+    disposition = content_disposition_header(as_attachment, filename)
+    if disposition:
+        response['Content-Disposition'] = disposition
+    # Read by metrics.MetricsMiddleware
+    response.download_backend = backend
+    response.download_size = os.path.getsize(path)
+    return response
+
+
+def _direct_response(request, path, content_type):
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    byte_range = _requested_range(request, size, etag, last_modified)
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    elif byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            _read_range(path, start, length), status=206, content_type=content_type
+        )
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _requested_range(request, size, etag, last_modified):
+    """
+    Return (start, end) for a satisfiable single range, False for an
+    unsatisfiable one and None when the whole file should be sent.
+    """
+    header = request.META.get('HTTP_RANGE', '').strip()
+    if not header or request.method not in ('GET', 'HEAD'):
+        return None
+
+    # If-Range: only honour Range if the client's copy is still current
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if if_range:
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != last_modified:
+            return None
+
+    # Multiple ranges are allowed to be ignored (RFC 9110 14.2)
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if (not first and not last) or size == 0:
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        start, end = max(size - length, 0), size - 1
+    else:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            return False
+        end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -1,11 +1,16 @@
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-import os
 import mimetypes
+import os
+from .file_serving import serve_file
 from .models import UserFile
+from .query_planner import plan_queryset
+from .sparse_fieldsets import SparseFieldsetMixin
 from rest_framework import serializers
 
 class UploadedBySerializer(serializers.ModelSerializer):
@@ -19,7 +24,7 @@ class UploadedBySerializer(serializers.ModelSerializer):
             'name': instance.username
         }
 
-class UserFileSerializer(serializers.ModelSerializer):
+class UserFileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     uploaded_by = UploadedBySerializer(read_only=True)
     
     class Meta:
@@ -27,15 +32,23 @@ class UserFileSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'file', 'uploaded_at', 'file_type', 'size', 'uploaded_by']
         read_only_fields = ['uploaded_by', 'file_type', 'size', 'uploaded_at']
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Files are only sent by the permission-checked download action
+        if data.get('file'):
+            data['file'] = reverse('file-download', args=[instance.pk], request=self.context.get('request'))
+        return data
+
 class FileViewSet(viewsets.ModelViewSet):
     parser_classes = (MultiPartParser, FormParser)
     serializer_class = UserFileSerializer
+    ordering = '-uploaded_at'
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         # For viewing all files in table view, return all files ordered by upload date
         # Users can only delete their own files (handled in destroy method)
-        return UserFile.objects.all().order_by('-uploaded_at')
+        return plan_queryset(UserFile.objects.all().order_by('-uploaded_at'), self.get_serializer())
 
     def perform_create(self, serializer):
         file_obj = self.request.FILES.get('file')
@@ -61,8 +74,14 @@ class FileViewSet(viewsets.ModelViewSet):
                 {"error": "You can only delete your own files"}, 
                 status=status.HTTP_403_FORBIDDEN
             )
-        # Delete the actual file
-        if instance.file:
-            if os.path.isfile(instance.file.path):
-                os.remove(instance.file.path)
+        # The stored file is released by file_cleanup once the row is deleted
         return super().destroy(request, *args, **kwargs)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download a file; like the list, open to every signed-in user"""
+        user_file = self.get_object()
+        # Sent by the configured download backend, see file_serving.py
+        if user_file.file and os.path.exists(user_file.file.path):
+            return serve_file(request, user_file.file.path, filename=user_file.name, as_attachment=True)
+        return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
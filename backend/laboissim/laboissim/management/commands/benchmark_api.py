@@ -0,0 +1,98 @@
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from laboissim.benchmarks import api
+from laboissim.benchmarks.seed import Scale, seed
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway test database and report p50/p95 latency, query count and response size '
+            'for every API route; fails on regressions against a saved baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--projects', type=int, default=500)
+        parser.add_argument('--documents-per-project', type=int, default=3)
+        parser.add_argument('--members-per-project', type=int, default=3)
+        parser.add_argument('--publications', type=int, default=500)
+        parser.add_argument('--user-files', type=int, default=500)
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per scenario')
+        parser.add_argument('--only', nargs='*', help='Route names to run')
+        parser.add_argument('--baseline', help='JSON report of a previous run to compare against')
+        parser.add_argument('--save', help='Write this run as a JSON report')
+        parser.add_argument('--max-queries', type=int, default=30,
+                            help='Fail when a GET runs more queries than this (catches N+1 on reads)')
+        parser.add_argument('--max-query-increase', type=int, default=0,
+                            help='Allowed extra queries per route over the baseline')
+        parser.add_argument('--max-latency-ratio', type=float, default=0.5,
+                            help='Allowed p95 growth over the baseline (0.5 = +50%%)')
+        parser.add_argument('--asgi', action='store_true',
+                            help="Send the requests through Django's ASGI handler instead of WSGI")
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the test database between runs')
+
+    def handle(self, *args, **options):
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'],
+                                     aliases={'default'})
+        try:
+            # Uploaded and downloaded files live in a scratch MEDIA_ROOT; the WSGI
+            # requests are for `localhost` and the ASGI test client always sends
+            # `Host: testserver`; login rate limits would turn the repeated
+            # logins into 429s; metrics are enabled so /metrics and their
+            # overhead are measured
+            rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+            allowed_hosts = [*settings.ALLOWED_HOSTS, 'localhost', 'testserver']
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root, ALLOWED_HOSTS=allowed_hosts,
+                                      REST_FRAMEWORK=rest_framework, METRICS_ENABLED=True):
+                report = self._run(options)
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+
+        failures = [f'{key}: {row["queries"]} queries (limit {options["max_queries"]})'
+                    for key, row in report.items()
+                    if key.startswith('GET ') and row['queries'] > options['max_queries']]
+        failures += [f'{key}: status {",".join(map(str, row["status"]))} (expected {row["expected_status"]})'
+                     for key, row in report.items() if row['status'] != [row['expected_status']]]
+        failures += [f'{key}: {problem}' for key, row in report.items() for problem in row['problems']]
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            failures += api.compare(report, baseline, options['max_query_increase'], options['max_latency_ratio'])
+        if failures:
+            raise CommandError('Benchmark regressions:\n  ' + '\n  '.join(failures))
+
+    def _run(self, options):
+        seed(Scale(users=options['users'], projects=options['projects'],
+                   documents_per_project=options['documents_per_project'],
+                   members_per_project=options['members_per_project'],
+                   publications=options['publications'], user_files=options['user_files']),
+             stdout=self.stdout)
+        fixtures = api.create_fixtures()
+        runner = api.Runner(fixtures, asgi=options['asgi'])
+
+        scenarios = api.scenarios()
+        if options['only']:
+            scenarios = [scenario for scenario in scenarios if scenario.route in options['only']]
+
+        covered = {scenario.route for scenario in api.scenarios()}
+        missing = api.route_names() - covered - set(api.SKIPPED_ROUTES)
+        if missing:
+            self.stdout.write(self.style.WARNING(f'Routes without a scenario: {", ".join(sorted(missing))}'))
+
+        report = {}
+        self.stdout.write(f'{"route":<52} {"status":>8} {"p50 ms":>8} {"p95 ms":>8} {"queries":>8} {"bytes":>9}')
+        for scenario in scenarios:
+            row = runner.run(scenario, options['iterations']).summary()
+            report[scenario.key] = row
+            status = ','.join(str(code) for code in row['status'])
+            self.stdout.write(f'{scenario.key:<52} {status:>8} {row["p50_ms"]:>8} {row["p95_ms"]:>8} '
+                              f'{row["queries"]:>8} {row["bytes"]:>9}')
+        return report
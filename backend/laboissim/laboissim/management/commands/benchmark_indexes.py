@@ -0,0 +1,105 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from django.test.utils import setup_databases, teardown_databases
+
+from laboissim.benchmarks.seed import Scale, seed
+from laboissim.models import Project, ProjectDeletionRequest, ProjectDocument, Publication, UserFile
+
+# Same index as migration 0018 adds to auth_user
+USER_EMAIL_INDEX = models.Index(fields=['email'], name='auth_user_email_idx')
+
+
+def hot_indexes():
+    """(model, index) pairs for the hot-path indexes added in migration 0018"""
+    pairs = [(model, index)
+             for model in (Project, ProjectDocument, ProjectDeletionRequest, UserFile, Publication)
+             for index in model._meta.indexes]
+    pairs.append((User, USER_EMAIL_INDEX))
+    return pairs
+
+
+def hot_queries():
+    """The filters and orderings run on every request, as (label, queryset) pairs"""
+    project_id = ProjectDocument.objects.order_by('?').values_list('project_id', flat=True).first()
+    email = User.objects.order_by('-pk').values_list('email', flat=True).first()
+    return [
+        ('public feed', Project.objects.filter(is_validated=True).order_by('-created_at')[:50]),
+        ('project list', Project.objects.order_by('-created_at')[:50]),
+        ('project documents', ProjectDocument.objects.filter(project_id=project_id).order_by('-uploaded_at')[:50]),
+        ('pending deletion request',
+         ProjectDeletionRequest.objects.filter(project_id=project_id, status='pending').order_by().values('pk')[:1]),
+        ('user files', UserFile.objects.order_by('-uploaded_at')[:50]),
+        ('publications', Publication.objects.order_by('-posted_at')[:50]),
+        ('user by email', User.objects.filter(email=email)),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway test database and compare the query plans and timings of the hot '
+            'queries without and with the indexes of migration 0018')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000,
+                            help='Projects, documents, publications and user files to create')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query when timing')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the test database between runs')
+
+    def handle(self, *args, **options):
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'],
+                                     aliases={'default'})
+        try:
+            self._run(options)
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+    def _run(self, options):
+        rows = options['rows']
+        if not Project.objects.exists():
+            seed(Scale(users=max(rows // 100, 10), projects=rows, documents_per_project=1,
+                       publications=rows, user_files=rows),
+                 rebuild_read_models=False, stdout=self.stdout)
+        queries = hot_queries()
+        indexes = hot_indexes()
+
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.remove_index(model, index)
+        self._analyze()
+        before = {label: self._measure(queryset, options['repeat']) for label, queryset in queries}
+
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+        self._analyze()
+        after = {label: self._measure(queryset, options['repeat']) for label, queryset in queries}
+
+        for label, _ in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(f'  without indexes: {before[label][0]:.2f} ms\n    ' +
+                              before[label][1].replace('\n', '\n    '))
+            self.stdout.write(f'  with indexes:    {after[label][0]:.2f} ms\n    ' +
+                              after[label][1].replace('\n', '\n    '))
+
+    def _measure(self, queryset, repeat):
+        """Median wall time in ms and the query plan of `queryset`"""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), queryset.explain()
+
+    def _analyze(self):
+        """Refresh the planner statistics so the new index set is taken into account"""
+        tables = [model._meta.db_table for model in (Project, ProjectDocument, ProjectDeletionRequest,
+                                                     UserFile, Publication, User)]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute('ANALYZE TABLE ' + ', '.join(connection.ops.quote_name(t) for t in tables))
+                cursor.fetchall()
+            else:
+                cursor.execute('ANALYZE')
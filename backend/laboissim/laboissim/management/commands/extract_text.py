@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from laboissim import text_extraction
+from laboissim.models import ProjectDocument, UserFile
+
+
+class Command(BaseCommand):
+    help = 'Extract the text of uploaded PDF and office files in a process pool and index it for search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Extraction processes (default TEXT_EXTRACTION_WORKERS)')
+        parser.add_argument('--batch-size', type=int, default=20, help='Files claimed from the queue at a time')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new uploads instead of exiting')
+        parser.add_argument('--interval', type=int, default=10, help='Seconds between polls with --loop')
+        parser.add_argument('--queue-existing', action='store_true',
+                            help='Queue every existing document and user file first')
+        parser.add_argument('--retry-failed', action='store_true', help='Retry files whose extraction failed')
+
+    def handle(self, *args, **options):
+        if options['queue_existing']:
+            for source, model in (('document', ProjectDocument), ('file', UserFile)):
+                for instance in model.objects.only('pk', 'file').iterator():
+                    text_extraction.queue(source, instance)
+        if options['retry_failed']:
+            text_extraction.retry_failed()
+
+        done, failed = text_extraction.run(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            stop_when_idle=not options['loop'],
+            poll_interval=options['interval'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Extracted {done} files ({failed} failed)'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from laboissim import derivatives
+from laboissim.models import Project, ProjectDocument
+
+
+class Command(BaseCommand):
+    help = 'Generate missing thumbnails and previews for project images and documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate derivatives that already exist')
+
+    def handle(self, *args, **options):
+        count = failed = 0
+        for model in (Project, ProjectDocument):
+            for instance in model.objects.iterator():
+                if not derivatives.source_file(instance):
+                    continue
+                if not options['force'] and not derivatives.needs_derivatives(instance):
+                    continue
+                try:
+                    derivatives.generate(instance)
+                    count += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{model.__name__} {instance.pk}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Generated derivatives for {count} files ({failed} failed)'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from laboissim.token_revocation import purge
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked refresh tokens that have expired (schedule it, e.g. hourly from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement')
+
+    def handle(self, *args, **options):
+        count = purge(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {count} revoked tokens'))
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from laboissim.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = 'Delete resumable upload sessions (and their partial files) that have been idle too long'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Idle time after which a session is purged')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = UploadSession.objects.filter(updated_at__lt=cutoff)
+        count = 0
+        for session in stale.iterator():
+            if session.status == 'active' and default_storage.exists(session.temp_name):
+                default_storage.delete(session.temp_name)
+            session.delete()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Purged {count} upload sessions'))
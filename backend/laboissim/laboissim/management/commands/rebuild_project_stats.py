@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from laboissim import project_stats
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-project counters behind /api/projects/stats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', action='store_true',
+                            help='First read from storage the size of documents that have none recorded')
+
+    def handle(self, *args, **options):
+        if options['sizes']:
+            count = project_stats.backfill_sizes()
+            self.stdout.write(f'Recorded the size of {count} documents')
+        with transaction.atomic():
+            count = project_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the stats of {count} projects'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from laboissim import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index behind /api/search'
+
+    def handle(self, *args, **options):
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} objects'))
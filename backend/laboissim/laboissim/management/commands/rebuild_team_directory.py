@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from laboissim import team_directory
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the team directory read model behind /api/team-members'
+
+    def handle(self, *args, **options):
+        count = team_directory.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} team directory entries'))
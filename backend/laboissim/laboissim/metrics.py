@@ -0,0 +1,328 @@
+"""
+Prometheus metrics, exported at /metrics in the text exposition format.
+
+The registry is in-process: each metric keeps its values in a dict guarded
+by its own lock, held only for the update. With METRICS_DIR set, every
+process also writes a snapshot of its values to a file of that directory at
+most every METRICS_FLUSH_INTERVAL seconds, and /metrics sums the snapshots
+of all the processes (gunicorn workers included). Snapshots of exited
+workers are kept so counters never go backwards; empty the directory when
+the service is (re)started.
+
+MetricsMiddleware records, per route name:
+
+- laboissim_http_request_duration_seconds (method, status)
+- laboissim_db_queries_per_request
+- laboissim_upload_bytes / laboissim_upload_duration_seconds for requests
+  carrying a file body (multipart or chunk uploads)
+- laboissim_download_bytes / laboissim_download_duration_seconds for the
+  files sent by file_serving.py, timed until the body is fully sent
+
+and the read-through caches report laboissim_cache_requests_total by
+result, from which the hit ratio is derived.
+
+Nothing is recorded unless METRICS_ENABLED; otherwise /metrics answers 404.
+"""
+import glob
+import hmac
+import json
+import math
+import os
+import threading
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.http import Http404, HttpResponse
+
+from . import query_hooks
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+TRANSFER_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(11))  # 1 KiB to 1 GiB
+
+UPLOAD_CONTENT_TYPES = ('multipart/form-data', 'application/octet-stream')
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def snapshot(self):
+        with self.lock:
+            return {key: (list(value) if isinstance(value, list) else value) for key, value in self.values.items()}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labelvalues, amount=1):
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def samples(self, key, value):
+        yield self.name + '_total', key, value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labelvalues, value):
+        # Index of the first bucket the value falls in; counts are made cumulative on export
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self.lock:
+            counts = self.values.get(labelvalues)
+            if counts is None:
+                # One count per bucket, +Inf, then the sum
+                counts = self.values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    @staticmethod
+    def merge(total, value):
+        return value if total is None else [a + b for a, b in zip(total, value)]
+
+    def samples(self, key, value):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), value[:-1]):
+            cumulative += count
+            yield self.name + '_bucket', key + (('le', _format_value(bound)),), cumulative
+        yield self.name + '_count', key, cumulative
+        yield self.name + '_sum', key, value[-1]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.snapshot_path = None
+        self.last_flush = 0.0
+        self.flush_lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def collect(self):
+        """{metric name: {label values: value}} for this process"""
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    # Aggregation across processes
+
+    def _directory(self):
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def flush(self, force=False):
+        """Write this process's snapshot if METRICS_FLUSH_INTERVAL has elapsed"""
+        directory = self._directory()
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+            return
+        if not self.flush_lock.acquire(blocking=False):
+            return  # another thread of this process is writing it
+        try:
+            self.last_flush = now
+            if self.snapshot_path is None:
+                # The pid alone could be reused by a later worker and overwrite this one's counts
+                os.makedirs(directory, exist_ok=True)
+                self.snapshot_path = os.path.join(directory, f'metrics-{os.getpid()}-{uuid.uuid4().hex[:8]}.json')
+            data = {name: [[list(key), value] for key, value in values.items()]
+                    for name, values in self.collect().items()}
+            temp_path = self.snapshot_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.snapshot_path)
+        finally:
+            self.flush_lock.release()
+
+    def aggregate(self):
+        """Values summed over every process writing to METRICS_DIR, or this process's own"""
+        directory = self._directory()
+        if not directory:
+            return self.collect()
+
+        self.flush(force=True)
+        totals = {name: {} for name in self.metrics}
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced, or from another deployment
+            for name, entries in data.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                for key, value in entries:
+                    key = tuple(key)
+                    if isinstance(metric, Histogram) and len(value) != len(metric.buckets) + 2:
+                        continue  # written with other buckets
+                    totals[name][key] = metric.merge(totals[name].get(key), value)
+        return totals
+
+    def render(self):
+        lines = []
+        for name, values in self.aggregate().items():
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key, value in sorted(values.items()):
+                labels = tuple(zip(metric.labelnames, key))
+                for sample_name, sample_labels, sample_value in metric.samples(labels, value):
+                    lines.append(f'{sample_name}{_format_labels(sample_labels)} {_format_value(sample_value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return str(value)
+
+
+registry = Registry()
+
+request_duration = registry.register(Histogram(
+    'laboissim_http_request_duration_seconds', 'Time to produce the response, per route',
+    ('route', 'method', 'status')))
+db_queries = registry.register(Histogram(
+    'laboissim_db_queries_per_request', 'SQL queries run by a request, per route',
+    ('route',), buckets=QUERY_BUCKETS))
+upload_bytes = registry.register(Histogram(
+    'laboissim_upload_bytes', 'Size of uploaded request bodies', ('route',), buckets=BYTES_BUCKETS))
+upload_duration = registry.register(Histogram(
+    'laboissim_upload_duration_seconds', 'Time to receive and store an upload', ('route',),
+    buckets=TRANSFER_BUCKETS))
+download_bytes = registry.register(Histogram(
+    'laboissim_download_bytes', 'Size of the files sent by the download backend', ('route', 'backend'),
+    buckets=BYTES_BUCKETS))
+download_duration = registry.register(Histogram(
+    'laboissim_download_duration_seconds', 'Time until a download body was fully handed to the server',
+    ('route', 'backend'), buckets=TRANSFER_BUCKETS))
+cache_requests = registry.register(Counter(
+    'laboissim_cache_requests', 'Read-through cache lookups by result (hit or miss)', ('cache', 'result')))
+
+
+def enabled():
+    return getattr(settings, 'METRICS_ENABLED', False)
+
+
+def cache_lookup(cache, hit):
+    if enabled():
+        cache_requests.inc(cache, 'hit' if hit else 'miss')
+
+
+def metrics_view(request):
+    """GET /metrics, optionally protected by METRICS_TOKEN (Authorization: Bearer <token>)"""
+    if not enabled():
+        raise Http404
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and not hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', '').encode(),
+                                         f'Bearer {token}'.encode()):
+        raise PermissionDenied
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _count(counter):
+    counter[0] += 1
+
+
+class MetricsMiddleware:
+    """Removes itself unless METRICS_ENABLED; works under WSGI and ASGI"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        query_hooks.enable()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        queries = [0]
+        start = time.perf_counter()
+        with query_hooks.observe(lambda sql, params, elapsed: _count(queries)):
+            response = self.get_response(request)
+        return self._record(request, response, start, queries[0])
+
+    async def __acall__(self, request):
+        queries = [0]
+        start = time.perf_counter()
+        with query_hooks.observe(lambda sql, params, elapsed: _count(queries)):
+            response = await self.get_response(request)
+        return self._record(request, response, start, queries[0])
+
+    def _record(self, request, response, start, queries):
+        elapsed = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unmatched'
+        request_duration.observe(route, request.method, str(response.status_code), value=elapsed)
+        db_queries.observe(route, value=queries)
+
+        content_type = request.META.get('CONTENT_TYPE', '')
+        if request.method in ('POST', 'PUT', 'PATCH') and content_type.startswith(UPLOAD_CONTENT_TYPES):
+            try:
+                size = int(request.META.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                size = 0
+            upload_bytes.observe(route, value=size)
+            upload_duration.observe(route, value=elapsed)
+
+        backend = getattr(response, 'download_backend', None)
+        if backend is not None and response.status_code in (200, 206):
+            self._time_download(response, route, backend, start)
+
+        registry.flush()
+        return response
+
+    def _time_download(self, response, route, backend, start):
+        if backend != 'django':
+            # The web server sends the file, only its size is known here
+            download_bytes.observe(route, backend, value=response.download_size)
+            return
+        try:
+            size = int(response.get('Content-Length') or 0)
+        except ValueError:
+            size = 0
+        # The server calls close() once the body has been sent (also for wsgi.file_wrapper)
+        close = response.close
+        closed = []
+
+        def timed_close():
+            close()
+            if not closed:
+                closed.append(True)
+                download_bytes.observe(route, backend, value=size)
+                download_duration.observe(route, backend, value=time.perf_counter() - start)
+        response.close = timed_close
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboissim', '0013_contentblob_uploadsession_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='derivatives_source',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='preview',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to='project_images/'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='thumbnail',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to='project_images/'),
+        ),
+        migrations.AddField(
+            model_name='projectdocument',
+            name='derivatives_source',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='projectdocument',
+            name='preview',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to='project_files/'),
+        ),
+        migrations.AddField(
+            model_name='projectdocument',
+            name='thumbnail',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to='project_files/'),
+        ),
+    ]
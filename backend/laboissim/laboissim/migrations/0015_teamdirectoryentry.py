@@ -0,0 +1,73 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import migrations, models
+from rest_framework import serializers
+
+PROFILE_FIELDS = ['phone', 'bio', 'profile_image', 'location', 'institution', 'website', 'linkedin', 'twitter',
+                  'github', 'role']
+
+
+def populate_directory(apps, schema_editor):
+    """Write every user's entry as team_directory.sync_user does at this point in the schema"""
+    User = apps.get_model('auth', 'User')
+    TeamDirectoryEntry = apps.get_model('laboissim', 'TeamDirectoryEntry')
+    date_field = serializers.DateTimeField()
+
+    entries = []
+    for user in User.objects.select_related('profile').iterator(chunk_size=500):
+        try:
+            profile = user.profile
+        except ObjectDoesNotExist:
+            profile = None
+        profile_data = None
+        if profile is not None:
+            profile_data = {}
+            for name in PROFILE_FIELDS:
+                value = getattr(profile, name)
+                if name == 'profile_image':
+                    value = value.url if value else None
+                profile_data[name] = value
+        role = 'admin' if user.is_superuser else (profile.role if profile is not None else 'member')
+        data = {
+            'id': user.pk,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'is_staff': user.is_staff,
+            'is_superuser': user.is_superuser,
+            'date_joined': date_field.to_representation(user.date_joined),
+            'profile': profile_data,
+            'full_name': f"{user.first_name} {user.last_name}".strip() or user.username,
+            'role': role,
+        }
+        entries.append(TeamDirectoryEntry(
+            user_id=user.pk, is_active=user.is_active, role=role,
+            institution=(profile.institution if profile is not None else None) or '', data=data))
+    TeamDirectoryEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('laboissim', '0014_project_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamDirectoryEntry',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='directory_entry', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('is_active', models.BooleanField(default=True)),
+                ('role', models.CharField(db_index=True, max_length=20)),
+                ('institution', models.CharField(blank=True, db_index=True, default='', max_length=200)),
+                ('data', models.JSONField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_directory, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboissim', '0015_teamdirectoryentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('project', 'Project'), ('publication', 'Publication'), ('document', 'Document')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('project_id', models.PositiveBigIntegerField(blank=True, db_index=True, null=True)),
+                ('is_public', models.BooleanField(default=False)),
+                ('title', models.CharField(max_length=500)),
+                ('snippet', models.CharField(blank=True, default='', max_length=300)),
+                ('length', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveIntegerField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='laboissim.searchdocument')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'document'], name='laboissim_s_term_50b7f3_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboissim', '0016_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchdocument',
+            name='is_internal',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='searchdocument',
+            name='kind',
+            field=models.CharField(choices=[('project', 'Project'), ('publication', 'Publication'), ('document', 'Document'), ('file', 'User file')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ExtractedText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('document', 'Project document'), ('file', 'User file')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('file_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('compressed_text', models.BinaryField(blank=True, null=True)),
+                ('text_length', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('source', 'object_id')},
+            },
+        ),
+    ]
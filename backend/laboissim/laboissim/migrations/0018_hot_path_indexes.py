@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+# auth.User belongs to django.contrib.auth, so its email index is added
+# through the schema editor rather than the model state
+USER_EMAIL_INDEX = models.Index(fields=['email'], name='auth_user_email_idx')
+
+
+def add_user_email_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('auth', 'User'), USER_EMAIL_INDEX)
+
+
+def remove_user_email_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('auth', 'User'), USER_EMAIL_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboissim', '0017_extractedtext'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['is_validated', '-created_at'], name='project_validated_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['-created_at'], name='project_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectdeletionrequest',
+            index=models.Index(fields=['project', 'status'], name='deletionreq_project_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectdocument',
+            index=models.Index(fields=['project', '-uploaded_at'], name='projectdoc_proj_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publication',
+            index=models.Index(fields=['-posted_at'], name='publication_posted_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userfile',
+            index=models.Index(fields=['-uploaded_at'], name='userfile_uploaded_at_idx'),
+        ),
+        # EmailBackend and the social auth pipeline look users up by email
+        migrations.RunPython(add_user_email_index, remove_user_email_index),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_emails(apps, schema_editor):
+    """Give each lower-cased address to the oldest account using it"""
+    User = apps.get_model('auth', 'User')
+    UserEmail = apps.get_model('laboissim', 'UserEmail')
+    owners = {}
+    for user_id, email in User.objects.order_by('pk').values_list('pk', 'email').iterator(chunk_size=500):
+        email = (email or '').strip().lower()
+        if email:
+            owners.setdefault(email, user_id)
+    UserEmail.objects.bulk_create([UserEmail(user_id=user_id, email=email) for email, user_id in owners.items()],
+                                  batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('laboissim', '0020_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserEmail',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='normalized_email', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('email', models.CharField(max_length=254, unique=True)),
+            ],
+        ),
+        migrations.RunPython(populate_emails, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+FILE_TYPES = ['document', 'image', 'presentation', 'spreadsheet', 'other']
+
+
+def populate_stats(apps, schema_editor):
+    """Record the stored size of every document, then count each project's stats"""
+    Project = apps.get_model('laboissim', 'Project')
+    ProjectDocument = apps.get_model('laboissim', 'ProjectDocument')
+    ProjectDeletionRequest = apps.get_model('laboissim', 'ProjectDeletionRequest')
+    ProjectStats = apps.get_model('laboissim', 'ProjectStats')
+
+    for document in ProjectDocument.objects.filter(size=0).exclude(file='').iterator(chunk_size=500):
+        try:
+            size = document.file.size
+        except (OSError, ValueError):
+            continue  # missing from storage
+        if size:
+            ProjectDocument.objects.filter(pk=document.pk).update(size=size)
+
+    stats = {project_id: {} for project_id in Project.objects.values_list('pk', flat=True)}
+    for row in ProjectDocument.objects.values('project_id', 'file_type').annotate(count=Count('pk'), size=Sum('size')):
+        counters = stats[row['project_id']]
+        field = f"{row['file_type']}_files" if row['file_type'] in FILE_TYPES else 'other_files'
+        counters[field] = counters.get(field, 0) + row['count']
+        counters['total_bytes'] = counters.get('total_bytes', 0) + (row['size'] or 0)
+    members = Project.members.through.objects.values('project_id').annotate(count=Count('pk'))
+    for project_id, count in members.values_list('project_id', 'count'):
+        stats[project_id]['member_count'] = count
+    pending = ProjectDeletionRequest.objects.filter(status='pending').values('project_id').annotate(count=Count('pk'))
+    for project_id, count in pending.values_list('project_id', 'count'):
+        stats[project_id]['pending_deletion_requests'] = count
+    ProjectStats.objects.bulk_create([ProjectStats(project_id=project_id, **counters)
+                                      for project_id, counters in stats.items()], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboissim', '0021_useremail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='laboissim.project')),
+                ('document_files', models.BigIntegerField(default=0)),
+                ('image_files', models.BigIntegerField(default=0)),
+                ('presentation_files', models.BigIntegerField(default=0)),
+                ('spreadsheet_files', models.BigIntegerField(default=0)),
+                ('other_files', models.BigIntegerField(default=0)),
+                ('total_bytes', models.BigIntegerField(default=0)),
+                ('member_count', models.BigIntegerField(default=0)),
+                ('pending_deletion_requests', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='projectdocument',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,7 @@
+import math
+import uuid
+import zlib
+
 from django.db import models
 from django.conf import settings
 from django.contrib.auth.models import User
@@ -5,6 +9,7 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.core.exceptions import PermissionDenied
 from django.utils import timezone
+from .permission_context import get_permission_context
 
 class SiteContent(models.Model):
     contact_address = models.CharField(max_length=255, blank=True, default='')
@@ -75,6 +80,12 @@ class UserFile(models.Model):
     file_type = models.CharField(max_length=50)
     size = models.BigIntegerField()
 
+    class Meta:
+        indexes = [
+            # File list ordering
+            models.Index(fields=['-uploaded_at'], name='userfile_uploaded_at_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -86,6 +97,9 @@ class Publication(models.Model):
     
     class Meta:
         ordering = ['-posted_at']
+        indexes = [
+            models.Index(fields=['-posted_at'], name='publication_posted_at_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -103,12 +117,23 @@ class Project(models.Model):
     funding_company = models.CharField(max_length=255, blank=True, null=True)
     funding_amount = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
     image = models.ImageField(upload_to='project_images/', blank=True, null=True)
+    # Resized WebP copies of `image`, generated in the background (see derivatives.py)
+    thumbnail = models.FileField(upload_to='project_images/', blank=True, null=True, editable=False)
+    preview = models.FileField(upload_to='project_images/', blank=True, null=True, editable=False)
+    derivatives_source = models.CharField(max_length=255, blank=True, default='', editable=False)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='created_projects')
     members = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='projects', blank=True)
     is_validated = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Public feed: validated projects, newest first
+            models.Index(fields=['is_validated', '-created_at'], name='project_validated_created_idx'),
+            models.Index(fields=['-created_at'], name='project_created_at_idx'),
+        ]
+
     def __str__(self):
         return self.title
     
@@ -134,76 +159,83 @@ class Project(models.Model):
     
     def can_user_upload_files(self, user):
         """Check if user can upload files to this project"""
+        context = get_permission_context(user)
         # Admin can upload to any project
-        if hasattr(user, 'profile') and user.profile.is_admin:
+        if context.is_admin:
             return True
         # Project creator can upload files
-        if self.created_by == user:
+        if context.is_creator(self):
             return True
         # Project members can upload files
-        if user in self.members.all():
+        if context.is_member(self):
             return True
         # Chef d'équipe can upload to their own projects
-        if (hasattr(user, 'profile') and 
-            user.profile.is_chef_d_equipe and 
-            self.created_by == user):
+        if context.is_chef_d_equipe and context.is_creator(self):
             return True
         return False
     
     def get_file_count_by_type(self):
         """Get count of files grouped by type"""
-        from django.db.models import Count
-        return self.documents.values('file_type').annotate(count=Count('file_type'))
+        # Read from the materialized counters (see project_stats.py)
+        from .project_stats import documents_by_type
+        try:
+            counts = documents_by_type(self.stats)
+        except ProjectStats.DoesNotExist:
+            from django.db.models import Count
+            return list(self.documents.values('file_type').annotate(count=Count('file_type')))
+        return [{'file_type': file_type, 'count': count} for file_type, count in counts.items() if count]
     
     def can_edit(self, user):
         """Check if user can edit this project"""
+        context = get_permission_context(user)
         # Admin can edit any project
-        if hasattr(user, 'profile') and user.profile.is_admin:
+        if context.is_admin:
             return True
         # Project creator can edit their own projects
-        if self.created_by == user:
+        if context.is_creator(self):
             return True
         # Chef d'équipe can edit their own projects
-        if (hasattr(user, 'profile') and 
-            user.profile.is_chef_d_equipe and 
-            self.created_by == user):
+        if context.is_chef_d_equipe and context.is_creator(self):
             return True
         return False
     
     def can_delete(self, user):
         """Check if user can delete this project"""
+        context = get_permission_context(user)
         # Admin can delete any project
-        if hasattr(user, 'profile') and user.profile.is_admin:
+        if context.is_admin:
             return True
         # Project creator can delete their own unvalidated projects
-        if self.created_by == user and not self.is_validated:
+        if context.is_creator(self) and not self.is_validated:
             return True
         # Chef d'équipe can delete their own unvalidated projects
-        if (hasattr(user, 'profile') and 
-            user.profile.is_chef_d_equipe and 
-            self.created_by == user and 
+        if (context.is_chef_d_equipe and 
+            context.is_creator(self) and 
             not self.is_validated):
             return True
         return False
     
     def can_request_deletion(self, user):
         """Check if user can request deletion of this project"""
+        context = get_permission_context(user)
         # Admin can request deletion of any project
-        if hasattr(user, 'profile') and user.profile.is_admin:
+        if context.is_admin:
             return True
         # Project creator can request deletion of their own validated projects
-        if self.created_by == user and self.is_validated:
+        if context.is_creator(self) and self.is_validated:
             return True
         # Chef d'équipe can request deletion of their own validated projects
-        if (hasattr(user, 'profile') and 
-            user.profile.is_chef_d_equipe and 
-            self.created_by == user and 
+        if (context.is_chef_d_equipe and 
+            context.is_creator(self) and 
             self.is_validated):
             return True
         return False
     
     def has_pending_deletion_request(self):
         """Check if there's a pending deletion request for this project"""
+        # Annotated by ProjectSerializer.annotate_queryset on list endpoints
+        if hasattr(self, 'pending_deletion_request_exists'):
+            return self.pending_deletion_request_exists
         return self.deletion_requests.filter(status='pending').exists()
 # ADDED:  new ProjectDocument model for file management
 class ProjectDocument(models.Model):
@@ -217,8 +249,14 @@ class ProjectDocument(models.Model):
     
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='documents')
     file = models.FileField(upload_to='project_files/')
+    # Resized WebP copies of images and of the first page of PDFs (see derivatives.py)
+    thumbnail = models.FileField(upload_to='project_files/', blank=True, null=True, editable=False)
+    preview = models.FileField(upload_to='project_files/', blank=True, null=True, editable=False)
+    derivatives_source = models.CharField(max_length=255, blank=True, default='', editable=False)
     name = models.CharField(max_length=255)
     file_type = models.CharField(max_length=20, choices=FILE_TYPE_CHOICES, default='document')
+    # Bytes, recorded when the file is stored (see project_stats.py)
+    size = models.PositiveBigIntegerField(default=0, editable=False)
     description = models.TextField(blank=True, null=True)
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='uploaded_project_files')
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -226,6 +264,10 @@ class ProjectDocument(models.Model):
     
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # A project's documents, newest first
+            models.Index(fields=['project', '-uploaded_at'], name='projectdoc_proj_uploaded_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.project.title}"
@@ -240,7 +282,7 @@ class ProjectDocument(models.Model):
     def file_size_mb(self):
         """Get file size in MB"""
         try:
-            return round(self.file.size / (1024 * 1024), 2)
+            return round((self.size or self.file.size) / (1024 * 1024), 2)
         except:
             return 0
     
@@ -252,53 +294,52 @@ class ProjectDocument(models.Model):
     
     def can_edit(self, user):
         """Check if user can edit this file"""
+        context = get_permission_context(user)
         # Admin can edit any file
-        if hasattr(user, 'profile') and user.profile.is_admin:
+        if context.is_admin:
             return True
         # Project creator can edit files
-        if self.project.created_by == user:
+        if context.is_creator(self.project):
             return True
         # File uploader can edit their own files
-        if self.uploaded_by == user:
+        if context.user_id is not None and self.uploaded_by_id == context.user_id:
             return True
         # Chef d'équipe can edit files in their projects
-        if (hasattr(user, 'profile') and 
-            user.profile.is_chef_d_equipe and 
-            self.project.created_by == user):
+        if context.is_chef_d_equipe and context.is_creator(self.project):
             return True
         return False
     
     def can_delete(self, user):
         """Check if user can delete this file"""
+        context = get_permission_context(user)
         # Admin can delete any file
-        if hasattr(user, 'profile') and user.profile.is_admin:
+        if context.is_admin:
             return True
         # Project creator can delete files
-        if self.project.created_by == user:
+        if context.is_creator(self.project):
             return True
         # File uploader can delete their own files
-        if self.uploaded_by == user:
+        if context.user_id is not None and self.uploaded_by_id == context.user_id:
             return True
         # Chef d'équipe can delete files in their projects
-        if (hasattr(user, 'profile') and 
-            user.profile.is_chef_d_equipe and 
-            self.project.created_by == user):
+        if context.is_chef_d_equipe and context.is_creator(self.project):
             return True
         return False
     
     def can_view(self, user):
         """Check if user can view this file"""
+        context = get_permission_context(user)
         # Admin can view any file
-        if hasattr(user, 'profile') and user.profile.is_admin:
+        if context.is_admin:
             return True
         # Project members can view public files
-        if self.is_public and user in self.project.members.all():
+        if self.is_public and self.project_id in context.member_project_ids:
             return True
         # Project creator can view all files
-        if self.project.created_by == user:
+        if context.is_creator(self.project):
             return True
         # File uploader can view their own files
-        if self.uploaded_by == user:
+        if context.user_id is not None and self.uploaded_by_id == context.user_id:
             return True
         return False
 
@@ -320,6 +361,10 @@ class ProjectDeletionRequest(models.Model):
     
     class Meta:
         ordering = ['-requested_at']
+        indexes = [
+            # has_pending_deletion_request
+            models.Index(fields=['project', 'status'], name='deletionreq_project_status_idx'),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=models.Q(status__in=['pending', 'approved', 'rejected']),
@@ -332,7 +377,7 @@ class ProjectDeletionRequest(models.Model):
     
     def can_be_approved_by(self, user):
         """Check if user can approve this deletion request"""
-        return (hasattr(user, 'profile') and user.profile.is_admin) or user.is_superuser
+        return get_permission_context(user).is_admin or user.is_superuser
     
     def approve(self, admin_user, notes=''):
         """Approve the deletion request"""
@@ -357,4 +402,242 @@ class ProjectDeletionRequest(models.Model):
         self.admin_notes = notes
         self.reviewed_at = timezone.now()
         self.reviewed_by = admin_user
-        self.save()
\ No newline at end of file
+        self.save()
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload: the client creates a session, PUTs numbered chunks
+    and completes it, which attaches the file as a ProjectDocument or UserFile.
+    """
+    TARGET_CHOICES = (
+        ('project_document', 'Project document'),
+        ('user_file', 'User file'),
+    )
+    STATUS_CHOICES = (
+        ('active', 'Active'),
+        ('complete', 'Complete'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    file_type = models.CharField(max_length=20, blank=True, default='')
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True, default='')
+    chunk_size = models.PositiveIntegerField()
+    received_chunks = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    result_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload of {self.filename} ({self.status})"
+
+    @property
+    def total_chunks(self):
+        return math.ceil(self.size / self.chunk_size)
+
+    @property
+    def missing_chunks(self):
+        received = set(self.received_chunks)
+        return [index for index in range(self.total_chunks) if index not in received]
+
+    @property
+    def temp_name(self):
+        """Storage name the chunks are written into until completion"""
+        return f'upload_sessions/{self.id}.part'
+
+    def chunk_bounds(self, index):
+        """Return the (offset, length) of chunk `index` in the final file"""
+        offset = index * self.chunk_size
+        return offset, max(0, min(self.chunk_size, self.size - offset))
+
+
+class ContentBlob(models.Model):
+    """A deduplicated file stored by ContentAddressedStorage"""
+    name = models.CharField(max_length=255, unique=True)
+    digest = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.digest} ({self.ref_count} references)"
+
+
+class TeamDirectoryEntry(models.Model):
+    """
+    Denormalized read model behind /api/team-members: one row per user with
+    the rendered team member payload, kept in sync by the signals in
+    team_directory.py.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='directory_entry')
+    is_active = models.BooleanField(default=True)
+    role = models.CharField(max_length=20, db_index=True)
+    institution = models.CharField(max_length=200, blank=True, default='', db_index=True)
+    data = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Directory entry for user {self.user_id}"
+
+
+class SearchDocument(models.Model):
+    """One indexed project, publication or project document (see search.py)"""
+    KIND_CHOICES = (
+        ('project', 'Project'),
+        ('publication', 'Publication'),
+        ('document', 'Document'),
+        ('file', 'User file'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    # Project the object belongs to, used to show private results to its members
+    project_id = models.PositiveBigIntegerField(blank=True, null=True, db_index=True)
+    is_public = models.BooleanField(default=False)
+    # Visible to any signed-in user, like the shared user files
+    is_internal = models.BooleanField(default=False)
+    title = models.CharField(max_length=500)
+    snippet = models.CharField(max_length=300, blank=True, default='')
+    length = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+
+class SearchPosting(models.Model):
+    """Weighted frequency of one term in one SearchDocument"""
+    term = models.CharField(max_length=64)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings')
+    frequency = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['term', 'document'])]
+
+    def __str__(self):
+        return f"{self.term} in {self.document}"
+
+
+class ExtractedText(models.Model):
+    """
+    Plain text pulled out of an uploaded PDF or office file, stored
+    zlib-compressed. Rows double as the extraction job queue worked by
+    `manage.py extract_text` (see text_extraction.py).
+    """
+    SOURCE_CHOICES = (
+        ('document', 'Project document'),
+        ('file', 'User file'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    compressed_text = models.BinaryField(blank=True, null=True)
+    text_length = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('source', 'object_id')
+
+    def __str__(self):
+        return f"Text of {self.source} {self.object_id} ({self.status})"
+
+    @property
+    def text(self):
+        if not self.compressed_text:
+            return ''
+        return zlib.decompress(bytes(self.compressed_text)).decode('utf-8')
+
+    @text.setter
+    def text(self, value):
+        value = value or ''
+        self.compressed_text = zlib.compress(value.encode('utf-8'), 6) if value else None
+        self.text_length = len(value)
+
+
+class ChangeEvent(models.Model):
+    """A change to a project, document or deletion request, streamed by /api/events/ (see events.py)"""
+    KIND_CHOICES = (
+        ('project', 'Project'),
+        ('document', 'Document'),
+        ('deletion_request', 'Deletion request'),
+    )
+    ACTION_CHOICES = (
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    project_id = models.PositiveBigIntegerField(blank=True, null=True)
+    # Sent to anonymous clients too (the project is validated)
+    is_public = models.BooleanField(default=False)
+    # Author of a deletion request, who sees its events besides the admins
+    owner_id = models.PositiveBigIntegerField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} {self.action}"
+
+
+class RevokedToken(models.Model):
+    """A refresh token that can no longer be used, kept until it expires (see token_revocation.py)"""
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
+
+
+class UserEmail(models.Model):
+    """
+    Lower-cased email of a user, unique, kept in sync by the signals in
+    user_emails.py so logins look users up by email through an index.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='normalized_email')
+    email = models.CharField(max_length=254, unique=True)
+
+    def __str__(self):
+        return self.email
+
+
+class ProjectStats(models.Model):
+    """
+    Materialized counters of one project, updated by the signals in
+    project_stats.py in the same transaction as the change they count.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    # Documents by ProjectDocument.file_type
+    document_files = models.BigIntegerField(default=0)
+    image_files = models.BigIntegerField(default=0)
+    presentation_files = models.BigIntegerField(default=0)
+    spreadsheet_files = models.BigIntegerField(default=0)
+    other_files = models.BigIntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)
+    member_count = models.BigIntegerField(default=0)
+    pending_deletion_requests = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for project {self.project_id}"
@@ -0,0 +1,25 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the view's `ordering` column.
+
+    Pagination is only applied when the client asks for it with ?cursor= or
+    ?page_size=, so existing clients keep receiving plain lists.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-pk'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        # Each viewset declares the indexed column it is listed by
+        self.ordering = getattr(view, 'ordering', None) or self.ordering
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,77 @@
+"""
+Password checks for logins, on a bounded pool of hashing threads.
+
+A PBKDF2 check costs tens of milliseconds of CPU. Run on the request
+threads, a burst of logins hashed on all of them at once and every request
+queued behind the CPU they used. Here at most LOGIN_HASH_WORKERS hashes run
+at once per process (hashlib releases the GIL, so size it to the cores) and
+at most LOGIN_HASH_QUEUE_SIZE more wait. The pool limits how many hashes
+run at once; it does not free request threads, as each login's thread
+blocks until its hash is done. A login arriving beyond that waits up to
+LOGIN_HASH_ADMISSION_TIMEOUT seconds for a slot and is then turned away
+with 503, so accepted logins keep a bounded latency and a burst of logins
+cannot take every core from the other requests.
+
+A login whose hash was made with an older algorithm or work factor than
+the first of PASSWORD_HASHERS is rehashed with it (the new hash is also
+computed on the pool). An unknown account costs one hash too, so response
+times do not tell which accounts exist.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+class LoginBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, try again in a moment.'
+    default_code = 'login_busy'
+
+
+def _get_pool():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            workers = getattr(settings, 'LOGIN_HASH_WORKERS', 4)
+            _slots = threading.BoundedSemaphore(workers + getattr(settings, 'LOGIN_HASH_QUEUE_SIZE', 16))
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+    return _pool, _slots
+
+
+def run(func, *args):
+    """Run `func` on the hashing pool and wait for it; LoginBusy when the pool is saturated"""
+    pool, slots = _get_pool()
+    if not slots.acquire(timeout=getattr(settings, 'LOGIN_HASH_ADMISSION_TIMEOUT', 1)):
+        raise LoginBusy()
+    try:
+        return pool.submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+def _verify(password, encoded):
+    """(correct, new encoded password or None); runs on the pool"""
+    is_correct, must_update = verify_password(password, encoded)
+    return is_correct, make_password(password) if is_correct and must_update else None
+
+
+def check_password(user, password):
+    """user.check_password() on the pool, upgrading an outdated hash"""
+    is_correct, upgraded = run(_verify, password, user.password)
+    if upgraded is not None:
+        user.password = upgraded
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+def check_unknown(password):
+    """Spend the time of a check for an account that does not exist"""
+    run(make_password, password)
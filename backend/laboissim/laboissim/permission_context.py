@@ -0,0 +1,47 @@
+from django.utils.functional import cached_property
+
+
+class PermissionContext:
+    """
+    Role and project membership of one user, loaded once and shared by every
+    permission check made while handling a request.
+    """
+
+    def __init__(self, user):
+        self._user = user
+        self.user_id = user.pk if user.is_authenticated else None
+        self.is_superuser = user.is_superuser
+        self.is_staff = user.is_staff
+        # Users created before the profile signal may have no profile
+        profile = getattr(user, 'profile', None) if self.user_id is not None else None
+        self.role = profile.role if profile is not None else None
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+    @property
+    def is_chef_d_equipe(self):
+        return self.role == 'chef_d_equipe'
+
+    @cached_property
+    def member_project_ids(self):
+        """Ids of the projects the user is a member of, loaded in one query"""
+        if self.user_id is None:
+            return frozenset()
+        return frozenset(self._user.projects.values_list('id', flat=True))
+
+    def is_creator(self, project):
+        return self.user_id is not None and project.created_by_id == self.user_id
+
+    def is_member(self, project):
+        return project.pk in self.member_project_ids
+
+
+def get_permission_context(user):
+    """Return the PermissionContext cached on `user`, building it on first use"""
+    context = getattr(user, '_permission_context', None)
+    if context is None:
+        context = PermissionContext(user)
+        user._permission_context = context
+    return context
@@ -0,0 +1,235 @@
+"""
+Opt-in per-request profiling (PROFILING_ENABLED).
+
+When enabled, ProfilingMiddleware splits the wall time of every request
+into exclusive sections:
+
+- db: SQL execution, with the query count and the statements run more than
+  once with the same parameters;
+- serializer: DRF `to_representation` (minus the queries it triggers);
+- permissions: DRF permission classes, object permissions included;
+- view: the rest of the DRF view;
+- other: middleware, URL resolution and non-DRF views.
+
+The breakdown is sent in a `Server-Timing` header, and a sample of the
+requests (PROFILING_SAMPLE_RATE) is kept with their most frequent statements
+in an in-process ring buffer of PROFILING_BUFFER_SIZE entries, readable at
+/api/admin/profiles/.
+
+The middleware works under WSGI and ASGI; queries run by the async ORM in
+worker threads are attributed through query_hooks.py.
+
+When disabled the middleware removes itself at startup (MiddlewareNotUsed)
+and DRF is left unpatched, so there is no per-request cost.
+"""
+import contextvars
+import functools
+import random
+import threading
+import time
+from collections import Counter, deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject, empty
+
+from . import query_hooks
+
+SECTIONS = ('db', 'serializer', 'permissions', 'view', 'other')
+# Statements kept per sampled request
+MAX_STATEMENTS = 20
+
+_current = contextvars.ContextVar('laboissim_profile', default=None)
+_buffer = deque(maxlen=getattr(settings, 'PROFILING_BUFFER_SIZE', 200))
+_buffer_lock = threading.Lock()
+_patch_lock = threading.Lock()
+_patched = False
+
+
+class Profile:
+    """Timings of one request; sections nest and only their own time is counted"""
+
+    def __init__(self):
+        self.totals = dict.fromkeys(SECTIONS, 0.0)
+        # [name, start, time spent in nested sections]
+        self.stack = [['other', time.perf_counter(), 0.0]]
+        self.queries = 0
+        self.statements = Counter()
+        self.statement_time = Counter()
+        self.duplicates = Counter()
+
+    def enter(self, name):
+        self.stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self):
+        name, start, nested = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        self.totals[name] += elapsed - nested
+        self.stack[-1][2] += elapsed
+
+    def finish(self):
+        while self.stack:
+            name, start, nested = self.stack.pop()
+            elapsed = time.perf_counter() - start
+            self.totals[name] += elapsed - nested
+            if self.stack:
+                self.stack[-1][2] += elapsed
+        return sum(self.totals.values())
+
+    def record_query(self, sql, params, elapsed):
+        # A leaf section: counted as db and taken out of the enclosing section
+        self.totals['db'] += elapsed
+        self.stack[-1][2] += elapsed
+        self.queries += 1
+        self.statements[sql] += 1
+        self.statement_time[sql] += elapsed
+        try:
+            self.duplicates[(sql, repr(params))] += 1
+        except Exception:
+            pass
+
+    @property
+    def duplicate_queries(self):
+        return sum(count - 1 for count in self.duplicates.values() if count > 1)
+
+
+def _section(name, method):
+    """Wrap `method` so that, during a profiled request, its time counts towards `name`"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return method(*args, **kwargs)
+        profile.enter(name)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            profile.exit()
+    wrapper.profiling_original = method
+    return wrapper
+
+
+def _patch_drf():
+    """Instrument the DRF hooks once per process"""
+    global _patched
+    from rest_framework import serializers, views
+
+    with _patch_lock:
+        if _patched:
+            return
+        targets = [
+            (views.APIView, 'dispatch', 'view'),
+            (views.APIView, 'check_permissions', 'permissions'),
+            (views.APIView, 'check_object_permissions', 'permissions'),
+            (serializers.Serializer, 'to_representation', 'serializer'),
+            (serializers.ListSerializer, 'to_representation', 'serializer'),
+        ]
+        for cls, attr, name in targets:
+            setattr(cls, attr, _section(name, getattr(cls, attr)))
+        _patched = True
+
+
+def server_timing(profile, total):
+    entries = [f'total;dur={total * 1000:.1f}']
+    for name in SECTIONS:
+        description = ''
+        if name == 'db':
+            description = f';desc="{profile.queries} queries, {profile.duplicate_queries} duplicated"'
+        entries.append(f'{name};dur={profile.totals[name] * 1000:.1f}{description}')
+    return ', '.join(entries)
+
+
+def _user_id(request):
+    user = getattr(request, 'user', None)
+    # Not resolved by the view: loading it here could query from the event loop
+    if type(user) is SimpleLazyObject and user._wrapped is empty:
+        return None
+    return getattr(user, 'pk', None)
+
+
+def _record(request, response, profile, total):
+    statements = [
+        {'sql': sql, 'count': count, 'ms': round(profile.statement_time[sql] * 1000, 2)}
+        for sql, count in profile.statements.most_common(MAX_STATEMENTS)
+    ]
+    match = getattr(request, 'resolver_match', None)
+    entry = {
+        'time': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.path,
+        'route': match.view_name if match else None,
+        'status': response.status_code,
+        'user_id': _user_id(request),
+        'total_ms': round(total * 1000, 2),
+        'sections_ms': {name: round(value * 1000, 2) for name, value in profile.totals.items()},
+        'queries': profile.queries,
+        'duplicate_queries': profile.duplicate_queries,
+        'statements': statements,
+    }
+    with _buffer_lock:
+        _buffer.append(entry)
+
+
+def recent(limit=None, path=None, min_ms=None):
+    """Sampled profiles, newest first"""
+    with _buffer_lock:
+        entries = list(_buffer)
+    entries.reverse()
+    if path:
+        entries = [entry for entry in entries if entry['path'].startswith(path)]
+    if min_ms is not None:
+        entries = [entry for entry in entries if entry['total_ms'] >= min_ms]
+    return entries[:limit] if limit else entries
+
+
+def clear():
+    with _buffer_lock:
+        _buffer.clear()
+
+
+class ProfilingMiddleware:
+    """Put it first in MIDDLEWARE so the other middleware are counted in 'other'"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.1)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        _patch_drf()
+        query_hooks.enable()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        profile = Profile()
+        token = _current.set(profile)
+        try:
+            with query_hooks.observe(profile.record_query):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = Profile()
+        token = _current.set(profile)
+        try:
+            with query_hooks.observe(profile.record_query):
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile)
+
+    def _finish(self, request, response, profile):
+        total = profile.finish()
+        response['Server-Timing'] = server_timing(profile, total)
+        if random.random() < self.sample_rate:
+            _record(request, response, profile, total)
+        return response
@@ -0,0 +1,36 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import profiling
+
+
+class ProfileListView(APIView):
+    """
+    GET /api/admin/profiles/[?path=/api/projects][&min_ms=100][&limit=50]
+
+    The sampled request profiles of this process, newest first (see
+    laboissim/profiling.py). DELETE empties the buffer.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 50))
+            min_ms = request.query_params.get('min_ms')
+            min_ms = float(min_ms) if min_ms else None
+        except ValueError:
+            return Response({'error': 'limit and min_ms must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = profiling.recent(limit=max(limit, 1), path=request.query_params.get('path'), min_ms=min_ms)
+        return Response({
+            'enabled': getattr(settings, 'PROFILING_ENABLED', False),
+            'count': len(entries),
+            'results': entries,
+        })
+
+    def delete(self, request):
+        profiling.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,211 @@
+"""
+Materialized per-project counters behind /api/projects/stats.
+
+ProjectStats holds, for each project, its documents by file type, their
+total size, its member count and its pending deletion requests. The signals
+below apply each change as an F() delta in the transaction that made it,
+so reading the counters never scans documents, and concurrent uploads do
+not overwrite each other's counts. Counts that signals cannot see
+(queryset update()/delete(), raw SQL) are corrected by
+`manage.py rebuild_project_stats`.
+
+Document sizes are stored on ProjectDocument.size when the file is saved,
+so the byte totals do not stat files in storage.
+"""
+from django.contrib.auth.models import User
+from django.db.models import Count, F, Sum
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Project, ProjectDeletionRequest, ProjectDocument, ProjectStats
+
+FILE_TYPES = [file_type for file_type, _ in ProjectDocument.FILE_TYPE_CHOICES]
+
+
+def type_field(file_type):
+    return f'{file_type}_files' if file_type in FILE_TYPES else 'other_files'
+
+
+def documents_by_type(stats):
+    return {file_type: getattr(stats, type_field(file_type)) for file_type in FILE_TYPES}
+
+
+def _apply(project_id, **deltas):
+    """Add `deltas` to the counters of `project_id`"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if project_id is None or not deltas:
+        return
+    # Projects without a row yet are filled in by rebuild_project_stats
+    ProjectStats.objects.filter(project_id=project_id).update(
+        updated_at=timezone.now(), **{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def _document_deltas(file_type, size, sign):
+    deltas = {type_field(file_type): sign}
+    deltas['total_bytes'] = sign * (size or 0)
+    return deltas
+
+
+def recount_members(project_ids):
+    through = Project.members.through
+    counts = dict(through.objects.filter(project_id__in=project_ids).values('project_id')
+                  .annotate(count=Count('pk')).values_list('project_id', 'count'))
+    for project_id in project_ids:
+        ProjectStats.objects.filter(project_id=project_id).update(member_count=counts.get(project_id, 0),
+                                                                  updated_at=timezone.now())
+
+
+def compute(project_ids=None):
+    """Counters of `project_ids` (every project by default), counted from the tables"""
+    projects = Project.objects.all()
+    if project_ids is not None:
+        projects = projects.filter(pk__in=project_ids)
+    values = {project_id: {} for project_id in projects.values_list('pk', flat=True)}
+
+    documents = ProjectDocument.objects.filter(project_id__in=values.keys()) if project_ids is not None \
+        else ProjectDocument.objects.all()
+    for row in documents.values('project_id', 'file_type').annotate(count=Count('pk'), size=Sum('size')):
+        counters = values.get(row['project_id'])
+        if counters is not None:
+            field = type_field(row['file_type'])
+            counters[field] = counters.get(field, 0) + row['count']
+            counters['total_bytes'] = counters.get('total_bytes', 0) + (row['size'] or 0)
+
+    through = Project.members.through
+    members = through.objects.filter(project_id__in=values.keys()) if project_ids is not None else through.objects
+    for project_id, count in members.values('project_id').annotate(count=Count('pk')).values_list('project_id', 'count'):
+        if project_id in values:
+            values[project_id]['member_count'] = count
+
+    pending = ProjectDeletionRequest.objects.filter(status='pending')
+    if project_ids is not None:
+        pending = pending.filter(project_id__in=values.keys())
+    for project_id, count in pending.values('project_id').annotate(count=Count('pk')).values_list('project_id', 'count'):
+        if project_id in values:
+            values[project_id]['pending_deletion_requests'] = count
+    return values
+
+
+def rebuild():
+    """Recreate every project's counters; returns the number of projects"""
+    values = compute()
+    ProjectStats.objects.all().delete()
+    ProjectStats.objects.bulk_create([ProjectStats(project_id=project_id, **counters)
+                                      for project_id, counters in values.items()], batch_size=500)
+    return len(values)
+
+
+def backfill_sizes():
+    """Record the size of documents stored before sizes were; returns how many were updated"""
+    count = 0
+    for document in ProjectDocument.objects.filter(size=0).exclude(file='').iterator(chunk_size=500):
+        try:
+            size = document.file.size
+        except (OSError, ValueError):
+            continue  # missing from storage
+        if size:
+            ProjectDocument.objects.filter(pk=document.pk).update(size=size)
+            count += 1
+    return count
+
+
+@receiver(post_save, sender=Project)
+def create_project_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ProjectStats.objects.get_or_create(project=instance)
+
+
+@receiver(pre_save, sender=ProjectDocument)
+def remember_document(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None
+    if not instance._state.adding:
+        previous = ProjectDocument.objects.filter(pk=instance.pk).values('project_id', 'file_type', 'size',
+                                                                        'file').first()
+    instance._stats_previous = previous
+    if instance.file and (previous is None and not instance.size
+                          or previous is not None and previous['file'] != instance.file.name):
+        try:
+            instance.size = instance.file.size
+        except (OSError, ValueError):
+            pass
+
+
+@receiver(post_save, sender=ProjectDocument)
+def count_document(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_stats_previous', None)
+    if previous is not None:
+        if (previous['project_id'], previous['file_type'], previous['size']) == (
+                instance.project_id, instance.file_type, instance.size):
+            return
+        _apply(previous['project_id'], **_document_deltas(previous['file_type'], previous['size'], -1))
+    elif not created:
+        return
+    _apply(instance.project_id, **_document_deltas(instance.file_type, instance.size, 1))
+
+
+@receiver(post_delete, sender=ProjectDocument)
+def uncount_document(sender, instance, **kwargs):
+    _apply(instance.project_id, **_document_deltas(instance.file_type, instance.size, -1))
+
+
+@receiver(m2m_changed, sender=Project.members.through)
+def count_members(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # The memberships of a user are gone by post_clear
+        instance._stats_cleared_projects = list(instance.projects.values_list('pk', flat=True))
+    elif action == 'post_add':
+        # pk_set only holds the memberships actually created
+        if reverse:
+            for project_id in pk_set:
+                _apply(project_id, member_count=1)
+        else:
+            _apply(instance.pk, member_count=len(pk_set))
+    elif action in ('post_remove', 'post_clear'):
+        # pk_set holds what was asked to be removed, not what was: recount
+        if not reverse:
+            recount_members([instance.pk])
+        elif action == 'post_remove':
+            recount_members(list(pk_set))
+        else:
+            recount_members(getattr(instance, '_stats_cleared_projects', []))
+
+
+@receiver(pre_delete, sender=User)
+def remember_memberships(sender, instance, **kwargs):
+    # Deleting a user drops its memberships without m2m_changed
+    instance._stats_member_of = list(instance.projects.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=User)
+def uncount_memberships(sender, instance, **kwargs):
+    recount_members(getattr(instance, '_stats_member_of', []))
+
+
+@receiver(pre_save, sender=ProjectDeletionRequest)
+def remember_deletion_request(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._stats_previous = None if instance._state.adding else ProjectDeletionRequest.objects.filter(
+        pk=instance.pk).values('project_id', 'status').first()
+
+
+@receiver(post_save, sender=ProjectDeletionRequest)
+def count_deletion_request(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_stats_previous', None)
+    if previous is not None and previous['status'] == 'pending':
+        _apply(previous['project_id'], pending_deletion_requests=-1)
+    if instance.status == 'pending' and (created or previous is not None):
+        _apply(instance.project_id, pending_deletion_requests=1)
+
+
+@receiver(post_delete, sender=ProjectDeletionRequest)
+def uncount_deletion_request(sender, instance, **kwargs):
+    if instance.status == 'pending':
+        _apply(instance.project_id, pending_deletion_requests=-1)
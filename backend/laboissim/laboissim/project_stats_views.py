@@ -0,0 +1,61 @@
+from django.db.models import Count, Sum
+from rest_framework import generics, serializers
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+
+from .models import ProjectStats
+from .project_stats import FILE_TYPES, documents_by_type, type_field
+
+COUNTERS = [type_field(file_type) for file_type in FILE_TYPES] + [
+    'total_bytes', 'member_count', 'pending_deletion_requests']
+
+
+class ProjectStatsSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source='project.title', read_only=True)
+    documents = serializers.SerializerMethodField()
+    documents_by_type = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProjectStats
+        fields = ['project', 'title', 'documents', 'documents_by_type', 'total_bytes', 'member_count',
+                  'pending_deletion_requests', 'updated_at']
+
+    def get_documents(self, obj):
+        return sum(documents_by_type(obj).values())
+
+    def get_documents_by_type(self, obj):
+        return documents_by_type(obj)
+
+
+class ProjectStatsView(generics.ListAPIView):
+    """
+    GET /api/projects/stats (admins only)
+
+    {"totals": {...}, "results": [one entry per project]}, read from the
+    materialized counters (see project_stats.py). ?page_size= paginates the
+    projects, with the totals still covering all of them.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    serializer_class = ProjectStatsSerializer
+    queryset = ProjectStats.objects.select_related('project').order_by('-project_id')
+    ordering = '-project_id'
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        sums = ProjectStats.objects.aggregate(projects=Count('pk'), **{field: Sum(field) for field in COUNTERS})
+        by_type = {file_type: sums[type_field(file_type)] or 0 for file_type in FILE_TYPES}
+        totals = {
+            'projects': sums['projects'],
+            'documents': sum(by_type.values()),
+            'documents_by_type': by_type,
+            'total_bytes': sums['total_bytes'] or 0,
+            'members': sums['member_count'] or 0,
+            'pending_deletion_requests': sums['pending_deletion_requests'] or 0,
+        }
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+            response.data = {'totals': totals, **response.data}
+            return response
+        return Response({'totals': totals, 'results': self.get_serializer(queryset, many=True).data})
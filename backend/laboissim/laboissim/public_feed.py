@@ -0,0 +1,134 @@
+"""
+Server-side cache for the public projects feed (/api/projects/public).
+
+The rendered feed is stored in the Django cache under a version token. Any
+committed change to a model that appears in the feed replaces the token,
+which both orphans the cached renderings and changes the ETag sent to
+clients. The token also expires after PUBLIC_PROJECTS_VERSION_TIMEOUT
+seconds, so with a per-process cache the workers that did not see the
+change stop answering 304 with the old ETag after at most that long.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from . import metrics
+from .models import Project, ProjectDocument, ProjectDeletionRequest, UserProfile
+
+VERSION_KEY = 'public_projects:version'
+
+
+def _version_timeout():
+    return getattr(settings, 'PUBLIC_PROJECTS_VERSION_TIMEOUT', 60)
+
+
+def _new_state():
+    return {'token': uuid.uuid4().hex, 'last_modified': int(time.time())}
+
+
+def get_state():
+    """Return the current version token and its Last-Modified timestamp"""
+    state = cache.get(VERSION_KEY)
+    if state is None:
+        # add() keeps the state of a concurrent worker if it won the race
+        cache.add(VERSION_KEY, _new_state(), _version_timeout())
+        state = cache.get(VERSION_KEY) or _new_state()
+    return state
+
+
+async def aget_state():
+    """get_state() for async views"""
+    state = await cache.aget(VERSION_KEY)
+    if state is None:
+        await cache.aadd(VERSION_KEY, _new_state(), _version_timeout())
+        state = await cache.aget(VERSION_KEY) or _new_state()
+    return state
+
+
+def invalidate():
+    """Drop every cached rendering of the public feed"""
+    cache.set(VERSION_KEY, _new_state(), _version_timeout())
+
+
+def etag_for(request, state):
+    """
+    The rendering depends on the requesting user (can_edit and friends) and
+    on the query string, so both are part of the ETag.
+    """
+    user = getattr(request, 'user', None)
+    variant = str(user.pk) if user is not None and user.is_authenticated else 'anon'
+    digest = hashlib.md5(
+        f"{state['token']}:{variant}:{request.get_full_path()}".encode()
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def cache_key(etag):
+    return 'public_projects:data:' + etag.strip('"')
+
+
+def get_cached(etag):
+    data = cache.get(cache_key(etag))
+    metrics.cache_lookup('public_feed', data is not None)
+    return data
+
+
+def set_cached(etag, data):
+    cache.set(cache_key(etag), data, getattr(settings, 'PUBLIC_PROJECTS_CACHE_TIMEOUT', 300))
+
+
+async def aget_cached(etag):
+    data = await cache.aget(cache_key(etag))
+    metrics.cache_lookup('public_feed', data is not None)
+    return data
+
+
+async def aset_cached(etag, data):
+    await cache.aset(cache_key(etag), data, getattr(settings, 'PUBLIC_PROJECTS_CACHE_TIMEOUT', 300))
+
+
+def filter_ids(request, queryset):
+    """
+    Only the projects listed in ?ids=1,2,3, so a client told about a change
+    by /api/events/ can refetch just those
+    """
+    ids = request.query_params.get('ids')
+    if ids is None:
+        return queryset
+    return queryset.filter(pk__in=[int(pk) for pk in ids.split(',') if pk.strip().isdigit()])
+
+
+def add_validators(response, etag, state):
+    """Let browsers revalidate with If-None-Match/If-Modified-Since"""
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(state['last_modified'])
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=ProjectDocument)
+@receiver(post_delete, sender=ProjectDocument)
+@receiver(post_save, sender=ProjectDeletionRequest)
+@receiver(post_delete, sender=ProjectDeletionRequest)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_public_feed(sender, **kwargs):
+    # After commit, so no request can cache the old rows under the new token
+    transaction.on_commit(invalidate)
+
+
+@receiver(m2m_changed, sender=Project.members.through)
+def invalidate_public_feed_members(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidate)
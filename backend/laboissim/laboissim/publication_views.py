@@ -1,6 +1,8 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from .models import Publication
+from .query_planner import plan_queryset
+from .sparse_fieldsets import SparseFieldsetMixin
 from rest_framework import serializers
 
 class PostedBySerializer(serializers.ModelSerializer):
@@ -14,7 +16,7 @@ class PostedBySerializer(serializers.ModelSerializer):
             'name': instance.username
         }
 
-class PublicationSerializer(serializers.ModelSerializer):
+class PublicationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     posted_by = PostedBySerializer(read_only=True)
     
     class Meta:
@@ -24,6 +26,7 @@ class PublicationSerializer(serializers.ModelSerializer):
 
 class PublicationViewSet(viewsets.ModelViewSet):
     serializer_class = PublicationSerializer
+    ordering = '-posted_at'
 
     def get_permissions(self):
         """
@@ -39,7 +42,7 @@ class PublicationViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         # Return all publications ordered by posting date
         # Users can only delete their own publications (handled in destroy method)
-        return Publication.objects.all().order_by('-posted_at')
+        return plan_queryset(Publication.objects.all().order_by('-posted_at'), self.get_serializer())
 
     def perform_create(self, serializer):
         serializer.save(posted_by=self.request.user)
@@ -0,0 +1,61 @@
+"""
+Per-request SQL observers for the profiling and metrics middleware.
+
+A connection's execute_wrapper() only sees the queries of the current
+thread, but under ASGI the async ORM and sync_to_async run them in worker
+threads. Observers are therefore kept in a ContextVar, which those threads
+inherit, and one wrapper installed on every connection hands each query to
+the observers of the request that ran it. Nothing is installed until a
+middleware calls enable().
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_observers = contextvars.ContextVar('laboissim_query_observers', default=())
+_enable_lock = threading.Lock()
+_enabled = False
+
+
+def _wrapper(execute, sql, params, many, context):
+    observers = _observers.get()
+    if not observers:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        for observer in observers:
+            observer(sql, params, elapsed)
+
+
+def _install(sender=None, connection=None, **kwargs):
+    if _wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_wrapper)
+
+
+def enable():
+    """Install the wrapper on the connections of this thread and on every new one"""
+    global _enabled
+    with _enable_lock:
+        if _enabled:
+            return
+        connection_created.connect(_install, dispatch_uid='laboissim.query_hooks')
+        for connection in connections.all(initialized_only=True):
+            _install(connection=connection)
+        _enabled = True
+
+
+@contextmanager
+def observe(observer):
+    """Call observer(sql, params, seconds) for each query run in this context"""
+    token = _observers.set(_observers.get() + (observer,))
+    try:
+        yield
+    finally:
+        _observers.reset(token)
@@ -0,0 +1,85 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+
+
+def plan_queryset(queryset, serializer):
+    """
+    Add the select_related/prefetch_related/annotations that `serializer`
+    needs so that serializing the whole queryset costs a constant number
+    of queries, whatever the number of rows.
+
+    `serializer` may be a serializer class or an instance. Passing the
+    instance returned by `get_serializer()` lets the plan follow the fields
+    actually rendered for the request.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    select, prefetch = [], []
+    _collect(serializer, queryset.model, '', select, prefetch)
+
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+
+    # Serializers can declare extra annotations for their method fields
+    annotate = getattr(serializer, 'annotate_queryset', None)
+    if annotate is not None:
+        queryset = annotate(queryset)
+    return queryset
+
+
+def _collect(serializer, model, prefix, select, prefetch):
+    """Walk the serializer fields and record the relations they traverse"""
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+
+        current_model = model
+        path = []
+        attrs = field.source_attrs
+        for index, attr in enumerate(attrs):
+            try:
+                model_field = current_model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # Properties and methods, nothing to plan
+                break
+            if not model_field.is_relation:
+                break
+
+            path.append(attr)
+            lookup = prefix + '__'.join(path)
+            is_last = index == len(attrs) - 1
+
+            if model_field.many_to_many or model_field.one_to_many:
+                if is_last and isinstance(field, serializers.ListSerializer):
+                    related_queryset = model_field.related_model._default_manager.all()
+                    prefetch.append(Prefetch(lookup, queryset=plan_queryset(related_queryset, field.child)))
+                else:
+                    _add(prefetch, lookup)
+                break
+
+            if not is_last:
+                # Dotted source such as 'project.title'
+                _add(select, lookup)
+                current_model = model_field.related_model
+                continue
+
+            if isinstance(field, serializers.BaseSerializer):
+                _add(select, lookup)
+                _collect(field, model_field.related_model, lookup + '__', select, prefetch)
+            elif isinstance(field, PrimaryKeyRelatedField) and model_field.concrete:
+                # Rendered from the local <name>_id column
+                pass
+            else:
+                _add(select, lookup)
+
+
+def _add(lookups, lookup):
+    if lookup not in lookups:
+        lookups.append(lookup)
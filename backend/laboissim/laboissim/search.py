@@ -0,0 +1,213 @@
+"""
+Built-in full-text search over projects, publications, project documents
+and user files, including the text extracted from uploaded files (see
+text_extraction.py).
+
+Each indexed object has a SearchDocument row and one SearchPosting per
+distinct term, holding the term frequency (title terms count TITLE_WEIGHT
+times). The index is updated by the signals below whenever an object is
+saved or deleted; `manage.py rebuild_search_index` recreates it. Queries are
+ranked with BM25.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import text_extraction
+from .models import Project, ProjectDocument, Publication, SearchDocument, SearchPosting, UserFile
+from .permission_context import get_permission_context
+
+TITLE_WEIGHT = 3
+MAX_QUERY_TERMS = 10
+SNIPPET_LENGTH = 300
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+STOP_WORDS = frozenset("""
+a an and are as at be by for from has in is it its of on or that the this to was were will with
+au aux avec ce ces dans de des du elle en est et il ils la le les leur mais ne nous ou par pas pour
+qui que sa se ses son sont sur un une
+""".split())
+
+
+def tokenize(text):
+    """Lower-case, accent-free terms of `text`, without stop words"""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    terms = []
+    for word in WORD_RE.findall(text):
+        if len(word) < 2 or word in STOP_WORDS:
+            continue
+        # Fold plurals so "proteins" finds "protein"
+        if len(word) > 4 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word[:64])
+    return terms
+
+
+def _project_fields(project):
+    return {
+        'title': project.title,
+        'body': [project.description, project.objectives, project.methodology, project.results],
+        'project_id': project.pk,
+        'is_public': project.is_validated,
+    }
+
+
+def _publication_fields(publication):
+    return {'title': publication.title, 'body': [publication.abstract], 'is_public': True}
+
+
+def _document_fields(document):
+    return {
+        'title': document.name,
+        'body': [document.description, text_extraction.text_for('document', document.pk)],
+        'project_id': document.project_id,
+    }
+
+
+def _user_file_fields(user_file):
+    # User files are shared with every signed-in user (see FileViewSet)
+    return {
+        'title': user_file.name,
+        'body': [text_extraction.text_for('file', user_file.pk)],
+        'is_internal': True,
+    }
+
+
+INDEXED_MODELS = {
+    'project': (Project, _project_fields),
+    'publication': (Publication, _publication_fields),
+    'document': (ProjectDocument, _document_fields),
+    'file': (UserFile, _user_file_fields),
+}
+KIND_BY_MODEL = {model: kind for kind, (model, _) in INDEXED_MODELS.items()}
+
+
+def index_object(instance):
+    """Add or refresh the index entry of a project, publication or document"""
+    kind = KIND_BY_MODEL[type(instance)]
+    fields = INDEXED_MODELS[kind][1](instance)
+    title, body = fields['title'], fields['body']
+
+    frequencies = Counter()
+    for term in tokenize(title):
+        frequencies[term] += TITLE_WEIGHT
+    for text in body:
+        frequencies.update(tokenize(text))
+
+    snippet = next((text for text in body if text), '') or ''
+    with transaction.atomic():
+        document, created = SearchDocument.objects.update_or_create(
+            kind=kind, object_id=instance.pk,
+            defaults={
+                'project_id': fields.get('project_id'),
+                'is_public': fields.get('is_public', False),
+                'is_internal': fields.get('is_internal', False),
+                'title': (title or '')[:500],
+                'snippet': snippet[:SNIPPET_LENGTH],
+                'length': sum(frequencies.values()),
+            },
+        )
+        if not created:
+            document.postings.all().delete()
+        SearchPosting.objects.bulk_create(
+            SearchPosting(term=term, document=document, frequency=frequency)
+            for term, frequency in frequencies.items()
+        )
+    return document
+
+
+def remove_object(instance):
+    SearchDocument.objects.filter(kind=KIND_BY_MODEL[type(instance)], object_id=instance.pk).delete()
+
+
+def rebuild():
+    """Recreate the whole index; returns the number of indexed objects"""
+    count = 0
+    with transaction.atomic():
+        SearchPosting.objects.all().delete()
+        SearchDocument.objects.all().delete()
+        for model, _ in INDEXED_MODELS.values():
+            for instance in model.objects.iterator(chunk_size=500):
+                index_object(instance)
+                count += 1
+    return count
+
+
+def visible_documents(user):
+    """The SearchDocuments `user` may see, following the API's own visibility rules"""
+    documents = SearchDocument.objects.all()
+    context = get_permission_context(user)
+    if context.is_admin:
+        return documents
+    visible = Q(is_public=True)
+    if context.user_id is not None:
+        own_projects = Project.objects.filter(created_by_id=context.user_id).values('id')
+        visible |= (Q(is_internal=True) | Q(project_id__in=context.member_project_ids) |
+                    Q(project_id__in=own_projects))
+    return documents.filter(visible)
+
+
+def search(user, query, kinds=None, limit=20):
+    """
+    Return up to `limit` (document, score) pairs matching `query`, best first.
+    Only the objects `user` is allowed to see are searched.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+
+    documents = visible_documents(user)
+    if kinds:
+        documents = documents.filter(kind__in=kinds)
+
+    stats = SearchDocument.objects.aggregate(total=Count('id'), average_length=Avg('length'))
+    total = stats['total'] or 0
+    average_length = stats['average_length'] or 1
+    document_frequency = dict(
+        SearchPosting.objects.filter(term__in=terms)
+        .values('term').annotate(count=Count('id')).values_list('term', 'count')
+    )
+
+    scores = defaultdict(float)
+    postings = (SearchPosting.objects
+                .filter(term__in=terms, document__in=documents)
+                .values_list('document_id', 'term', 'frequency', 'document__length'))
+    for document_id, term, frequency, length in postings:
+        df = document_frequency.get(term, 0)
+        idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+        norm = K1 * (1 - B + B * length / average_length)
+        scores[document_id] += idf * frequency * (K1 + 1) / (frequency + norm)
+
+    best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    by_id = SearchDocument.objects.in_bulk([document_id for document_id, _ in best])
+    return [(by_id[document_id], score) for document_id, score in best]
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Publication)
+@receiver(post_save, sender=ProjectDocument)
+@receiver(post_save, sender=UserFile)
+def update_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_object(instance)
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Publication)
+@receiver(post_delete, sender=ProjectDocument)
+@receiver(post_delete, sender=UserFile)
+def remove_from_index(sender, instance, **kwargs):
+    remove_object(instance)
@@ -0,0 +1,55 @@
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import search
+from .models import SearchDocument
+
+MAX_LIMIT = 100
+
+
+class SearchView(APIView):
+    """
+    GET /api/search/?q=<text>[&type=project,publication,document,file][&limit=20]
+
+    Ranked full-text search over projects, publications, project documents
+    and user files (type `file`), matching extracted text too. Anonymous
+    users only get validated projects and publications; documents and
+    unvalidated projects show up for their project's members, and user files
+    for every signed-in user, who can all list them at /api/files.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'The q parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        kinds = [kind for kind in request.query_params.get('type', '').split(',') if kind]
+        valid_kinds = dict(SearchDocument.KIND_CHOICES)
+        if any(kind not in valid_kinds for kind in kinds):
+            return Response({'error': f"type must be among: {', '.join(valid_kinds)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = search.search(request.user, query, kinds=kinds, limit=limit)
+        return Response({
+            'query': query,
+            'count': len(results),
+            'results': [
+                {
+                    'type': document.kind,
+                    'id': document.object_id,
+                    'project_id': document.project_id,
+                    'title': document.title,
+                    'snippet': document.snippet,
+                    'score': round(score, 4),
+                }
+                for document, score in results
+            ],
+        })
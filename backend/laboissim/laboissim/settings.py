@@ -19,6 +19,55 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# How downloads are sent after the permission checks: 'django' (served by
+# the worker, with Range support), 'x-accel-redirect' (nginx) or 'x-sendfile'.
+# For nginx, map the prefix to MEDIA_ROOT in an `internal` location.
+FILE_DOWNLOAD_BACKEND = 'django'
+FILE_DOWNLOAD_ACCEL_PREFIX = '/protected-media/'
+
+# Resumable uploads (/api/uploads): chunks are written straight into
+# MEDIA_ROOT/upload_sessions/, so the default storage must be on local disk.
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_MAX_SIZE = None  # bytes, None for no limit
+
+# Threads writing file bodies concurrently in /api/project-documents/bulk_upload
+BULK_UPLOAD_MAX_WORKERS = 4
+
+# Opt-in deduplicating storage: identical uploads share one blob on disk
+# (see laboissim/storage.py). With instant uploads enabled, an upload session
+# created with the sha256 of a file its user already stores completes without
+# chunks.
+CONTENT_ADDRESSED_STORAGE = False
+CONTENT_ADDRESSED_INSTANT_UPLOADS = True
+
+# WebP thumbnails and previews of project images, image documents and the
+# first page of PDFs, rendered by a background thread pool after upload.
+# PDFs need PyMuPDF or poppler's pdftoppm; backfill with
+# `manage.py generate_derivatives`.
+DERIVATIVES_ENABLED = True
+DERIVATIVE_WORKERS = 2
+THUMBNAIL_SIZE = 320
+PREVIEW_SIZE = 1024
+
+# Text extraction for search (`manage.py extract_text`, see
+# laboissim/text_extraction.py). PDFs need pypdf or poppler's pdftotext.
+TEXT_EXTRACTION_WORKERS = 2
+TEXT_EXTRACTION_MAX_CHARS = 1_000_000
+TEXT_EXTRACTION_MAX_ATTEMPTS = 3
+TEXT_EXTRACTION_STALE_MINUTES = 30
+
+STORAGES = {
+    'default': {
+        'BACKEND': (
+            'laboissim.storage.ContentAddressedStorage' if CONTENT_ADDRESSED_STORAGE
+            else 'django.core.files.storage.FileSystemStorage'
+        ),
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -53,6 +102,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Removes itself unless PROFILING_ENABLED; first so it sees the whole request
+    'laboissim.profiling.ProfilingMiddleware',
+    'laboissim.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -96,6 +148,40 @@ DATABASES = {
     }
 }
 
+# The default local-memory cache is per process. Point this at a shared
+# backend (Redis, Memcached) in production so every worker sees invalidations.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Seconds a rendering of /api/projects/public stays cached (it is also
+# invalidated whenever a project, document or profile changes). The version
+# token behind the cached renderings and the ETag expires after
+# PUBLIC_PROJECTS_VERSION_TIMEOUT seconds, which bounds how long workers of a
+# per-process cache keep the old one; raise it with a shared backend.
+PUBLIC_PROJECTS_CACHE_TIMEOUT = 300
+PUBLIC_PROJECTS_VERSION_TIMEOUT = 60
+
+# Site content (footer, contact block) is cached in each process. Set
+# SITE_CONTENT_CACHE to a shared cache alias (Redis, Memcached) to check the
+# copy against a version token there, so an update reaches every worker at
+# once; None keeps only the in-process copy, refreshed every
+# SITE_CONTENT_LOCAL_TIMEOUT seconds. The token expires after
+# SITE_CONTENT_VERSION_TIMEOUT seconds.
+SITE_CONTENT_CACHE = None
+SITE_CONTENT_CACHE_TIMEOUT = 24 * 3600
+SITE_CONTENT_LOCAL_TIMEOUT = 60
+SITE_CONTENT_VERSION_TIMEOUT = 60
+
+# JWT-authenticated requests read the user and its profile from this cache
+# alias (None to always query). Entries are dropped when the user or profile
+# is saved; with a per-process cache such as LocMemCache other workers only
+# see the change after JWT_USER_CACHE_TIMEOUT seconds.
+JWT_USER_CACHE = 'default'
+JWT_USER_CACHE_TIMEOUT = 60
+
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -122,6 +208,61 @@ CORS_ALLOW_HEADERS = [
 ]
 SESSION_COOKIE_SAMESITE = "Lax"
 SESSION_COOKIE_SECURE = False
+# Per-request profiling (laboissim/profiling.py): Server-Timing headers with
+# the time spent in SQL, serializers, permissions and views, and a sample of
+# the requests kept in memory for /api/admin/profiles/.
+PROFILING_ENABLED = False
+PROFILING_SAMPLE_RATE = 0.1
+PROFILING_BUFFER_SIZE = 200
+
+# Prometheus metrics at /metrics (laboissim/metrics.py). Under gunicorn, point
+# METRICS_DIR at a local directory emptied on startup so every worker's
+# snapshot (written at most every METRICS_FLUSH_INTERVAL seconds) is summed.
+# With METRICS_TOKEN set, scrapers send `Authorization: Bearer <token>`; set
+# one whenever /metrics is reachable from outside, as it lists routes and
+# traffic. Off by default: the middleware and query hooks then cost nothing.
+METRICS_ENABLED = False
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = None
+
+# Server-sent change events at /api/events/ (laboissim/events.py). Under ASGI
+# a stream stays open indefinitely; under WSGI it ties up a worker thread and
+# is closed after EVENTS_WSGI_MAX_SECONDS (the browser reconnects with
+# Last-Event-ID). Events are kept EVENTS_RETENTION_HOURS for replay.
+EVENTS_POLL_INTERVAL = 1.0
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_RETRY_MS = 3000
+EVENTS_WSGI_MAX_SECONDS = 30
+EVENTS_RETENTION_HOURS = 24
+EVENTS_REPLAY_LIMIT = 1000
+EVENTS_QUEUE_SIZE = 1000
+
+# Logging
+# Authorization decisions are logged to 'laboissim.authz' (denials at INFO,
+# grants at DEBUG). Lower its level to audit them; it costs nothing at WARNING.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'laboissim': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+        'laboissim.authz': {
+            'level': 'WARNING',
+        },
+    },
+}
+
+# Fraction of granted authorization decisions that are logged
+AUTHZ_LOG_SAMPLE_RATE = 1.0
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -165,9 +306,18 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # simplejwt's JWTAuthentication with the user read from a cache
+        'laboissim.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
+    # Opt-in per request with ?cursor= or ?page_size=
+    'DEFAULT_PAGINATION_CLASS': 'laboissim.pagination.OptionalCursorPagination',
+    # Login attempts per client address and per account (laboissim/throttles.py),
+    # counted in the default cache
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_account': '10/min',
+    },
 }
 
 # JWT Settings
@@ -197,14 +347,36 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    # Rotated refresh tokens are revoked in laboissim.RevokedToken rather than
+    # the token_blacklist app; purge it with `manage.py purge_revoked_tokens`
+    'TOKEN_REFRESH_SERIALIZER': 'laboissim.token_revocation.RotatingTokenRefreshSerializer',
 }
 
 AUTHENTICATION_BACKENDS = [
+    # Email or username logins, hashing on a bounded pool (replaces ModelBackend)
     'laboissim.auth_backend.EmailBackend',
-    'django.contrib.auth.backends.ModelBackend',
     'social_core.backends.google.GoogleOAuth2',
 ]
 
+# Password checks run on LOGIN_HASH_WORKERS threads per process, with up to
+# LOGIN_HASH_QUEUE_SIZE more logins waiting; past that a login waits at most
+# LOGIN_HASH_ADMISSION_TIMEOUT seconds for a slot, then gets a 503
+# (laboissim/password_hashing.py).
+LOGIN_HASH_WORKERS = 4
+LOGIN_HASH_QUEUE_SIZE = 16
+LOGIN_HASH_ADMISSION_TIMEOUT = 1
+
+# New hashes use the first hasher; a login with a hash from any other one
+# (or with fewer iterations) is rehashed. To move to Argon2, install
+# argon2-cffi and put Argon2PasswordHasher first.
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 SOCIAL_AUTH_PIPELINE = (
     'social_core.pipeline.social_auth.social_details',
     'social_core.pipeline.social_auth.social_uid',
@@ -0,0 +1,147 @@
+"""
+Read-through cache for the SiteContent singleton (footer and contact block).
+
+Two tiers:
+
+- in-process: the rendered content, tagged with the version it was read at;
+- shared (optional, SITE_CONTENT_CACHE names a cache alias): a version
+  token plus the rendering for that version, so every worker sees an update
+  as soon as it is saved.
+
+A read checks the shared version token and returns the in-process copy when
+it matches, so it costs one cache get and no query. Without a shared tier
+the in-process copy is reused for SITE_CONTENT_LOCAL_TIMEOUT seconds. Saving
+SiteContent replaces the version token. The token also expires after
+SITE_CONTENT_VERSION_TIMEOUT seconds, which bounds how long a worker the
+invalidation did not reach (a per-process cache alias) serves old content.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import metrics
+from .models import SiteContent
+
+VERSION_KEY = 'site_content:version'
+SINGLETON_ID = 1
+
+# (version, data, loaded_at) of this process
+_local = (None, None, 0)
+_lock = threading.Lock()
+
+
+def _shared_cache():
+    alias = getattr(settings, 'SITE_CONTENT_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _version_timeout():
+    return getattr(settings, 'SITE_CONTENT_VERSION_TIMEOUT', 60)
+
+
+def _render(content):
+    from .views import SiteContentSerializer
+
+    return dict(SiteContentSerializer(content or SiteContent(id=SINGLETON_ID)).data)
+
+
+def _load():
+    """Render the singleton from the database, without creating it"""
+    return _render(SiteContent.objects.filter(id=SINGLETON_ID).first())
+
+
+async def _aload():
+    return _render(await SiteContent.objects.filter(id=SINGLETON_ID).afirst())
+
+
+def get_data():
+    """Return the rendered site content"""
+    global _local
+    version, data, loaded_at = _local
+    shared = _shared_cache()
+
+    if shared is None:
+        if data is not None and time.monotonic() - loaded_at < getattr(settings, 'SITE_CONTENT_LOCAL_TIMEOUT', 60):
+            metrics.cache_lookup('site_content', True)
+            return data
+        metrics.cache_lookup('site_content', False)
+        data = _load()
+        with _lock:
+            _local = (None, data, time.monotonic())
+        return data
+
+    current = shared.get(VERSION_KEY)
+    if current is None:
+        # add() keeps the token of a concurrent worker if it won the race
+        shared.add(VERSION_KEY, uuid.uuid4().hex, _version_timeout())
+        current = shared.get(VERSION_KEY)
+    if data is not None and version == current:
+        metrics.cache_lookup('site_content', True)
+        return data
+
+    data_key = f'site_content:data:{current}'
+    data = shared.get(data_key)
+    metrics.cache_lookup('site_content', data is not None)
+    if data is None:
+        data = _load()
+        shared.set(data_key, data, getattr(settings, 'SITE_CONTENT_CACHE_TIMEOUT', 24 * 3600))
+    with _lock:
+        _local = (current, data, time.monotonic())
+    return data
+
+
+async def aget_data():
+    """get_data() for async views: awaits the shared cache and the database"""
+    global _local
+    version, data, loaded_at = _local
+    shared = _shared_cache()
+
+    if shared is None:
+        if data is not None and time.monotonic() - loaded_at < getattr(settings, 'SITE_CONTENT_LOCAL_TIMEOUT', 60):
+            metrics.cache_lookup('site_content', True)
+            return data
+        metrics.cache_lookup('site_content', False)
+        data = await _aload()
+        with _lock:
+            _local = (None, data, time.monotonic())
+        return data
+
+    current = await shared.aget(VERSION_KEY)
+    if current is None:
+        await shared.aadd(VERSION_KEY, uuid.uuid4().hex, _version_timeout())
+        current = await shared.aget(VERSION_KEY)
+    if data is not None and version == current:
+        metrics.cache_lookup('site_content', True)
+        return data
+
+    data_key = f'site_content:data:{current}'
+    data = await shared.aget(data_key)
+    metrics.cache_lookup('site_content', data is not None)
+    if data is None:
+        data = await _aload()
+        await shared.aset(data_key, data, getattr(settings, 'SITE_CONTENT_CACHE_TIMEOUT', 24 * 3600))
+    with _lock:
+        _local = (current, data, time.monotonic())
+    return data
+
+
+def invalidate():
+    global _local
+    with _lock:
+        _local = (None, None, 0)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.set(VERSION_KEY, uuid.uuid4().hex, _version_timeout())
+
+
+@receiver(post_save, sender=SiteContent)
+@receiver(post_delete, sender=SiteContent)
+def invalidate_site_content(sender, **kwargs):
+    # After commit, so no worker can cache the old row under the new version
+    transaction.on_commit(invalidate)
@@ -1,6 +1,10 @@
 from django.contrib.auth import get_user_model
+import logging
+
+from .user_emails import find_user
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 def save_profile(backend, user, response, *args, **kwargs):
     if backend.name == 'google-oauth2':
@@ -10,7 +14,7 @@ def save_profile(backend, user, response, *args, **kwargs):
         try:
             user.save(update_fields=['first_name', 'last_name'])
         except Exception as e:
-            print(f"Error saving user profile: {e}")
+            logger.warning("Error saving user profile for user %s: %s", user.id, e)
             # If save fails, at least ensure name fields are saved
             User.objects.filter(id=user.id).update(
                 first_name=response.get('given_name', ''),
@@ -21,10 +25,7 @@ def save_profile(backend, user, response, *args, **kwargs):
 def prevent_duplicate_email(strategy, details, backend, uid, user=None, *args, **kwargs):
     email = details.get('email')
     if email:
-        User = get_user_model()
-        try:
-            existing_user = User.objects.get(email=email)
+        existing_user = find_user(email)
+        if existing_user is not None:
             return {'user': existing_user}
-        except User.DoesNotExist:
-            pass
     return {} 
\ No newline at end of file
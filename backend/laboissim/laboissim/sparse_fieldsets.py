@@ -0,0 +1,53 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _split(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for the ?fields= and ?expand= query parameters.
+
+    - ?fields=id,title only renders the listed top-level fields.
+    - ?expand=created_by renders the listed nested relations in full and the
+      other nested relations as primary keys. Without ?expand every nested
+      relation is rendered in full, as before.
+
+    Only the top-level serializer of a read request is affected.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS or not self._is_root():
+            return fields
+
+        params = request.query_params
+        if 'fields' in params:
+            wanted = _split(params['fields'])
+            for name in list(fields):
+                if name not in wanted:
+                    del fields[name]
+
+        if 'expand' in params:
+            expand = _split(params['expand'])
+            for name, field in list(fields.items()):
+                if isinstance(field, serializers.BaseSerializer) and name not in expand:
+                    fields[name] = self._collapse(field)
+        return fields
+
+    def _is_root(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    @staticmethod
+    def _collapse(field):
+        """Replace a nested serializer with the primary key(s) it points to"""
+        kwargs = {'read_only': True}
+        if field.source is not None:
+            kwargs['source'] = field.source
+        if isinstance(field, serializers.ListSerializer):
+            kwargs['many'] = True
+        return serializers.PrimaryKeyRelatedField(**kwargs)
@@ -0,0 +1,127 @@
+"""
+Content-addressed, deduplicating file storage (opt-in, see
+CONTENT_ADDRESSED_STORAGE in settings).
+
+Every file is hashed with SHA-256 while it is written and stored once under
+cas/<aa>/<bb>/<digest><ext>, whatever upload_to the model field asks for
+(the extension is kept so type detection on file names still works).
+A ContentBlob row counts how many model fields reference each blob; the
+file is removed when the last reference is deleted.
+"""
+import hashlib
+import os
+import pathlib
+import tempfile
+
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+CAS_PREFIX = 'cas/'
+READ_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest, size, source_path = self._hash(content)
+        return self._add_reference(self.blob_name(digest, name), digest, size, source_path)
+
+    def reference(self, digest, filename, size=None):
+        """
+        Add a reference to an already stored blob and return its name, or
+        None if this content is not stored yet. Lets clients that send the
+        hash first skip the upload entirely.
+        """
+        from .models import ContentBlob
+
+        name = self.blob_name(digest, filename)
+        with transaction.atomic():
+            blobs = ContentBlob.objects.filter(name=name)
+            if size is not None:
+                blobs = blobs.filter(size=size)
+            if not blobs.update(ref_count=F('ref_count') + 1):
+                return None
+            if not self.exists(name):
+                transaction.set_rollback(True)
+                return None
+        return name
+
+    def delete(self, name):
+        if not name or not name.startswith(CAS_PREFIX):
+            return super().delete(name)
+
+        from .models import ContentBlob
+
+        with transaction.atomic():
+            if ContentBlob.objects.filter(name=name, ref_count__gt=1).update(ref_count=F('ref_count') - 1):
+                return
+            # Last reference: the row lock keeps concurrent saves out until the file is gone
+            ContentBlob.objects.select_for_update().filter(name=name).delete()
+            super().delete(name)
+
+    def blob_name(self, digest, original_name):
+        # Keep the extension so type detection on file.name keeps working
+        ext = ''.join(pathlib.PurePath(original_name).suffixes[-1:]).lower()
+        return f'{CAS_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+    def _hash(self, content):
+        """
+        Hash `content`, returning (digest, size, path of a local file holding it).
+        Uploads already on disk are hashed in place; anything else is spooled to
+        a temporary file under cas/tmp/ while being hashed.
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'temporary_file_path'):
+            path = content.temporary_file_path()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(READ_SIZE), b''):
+                    hasher.update(block)
+                    size += len(block)
+            return hasher.hexdigest(), size, path
+
+        temp_dir = self.path(CAS_PREFIX + 'tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=temp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+        except Exception:
+            os.remove(path)
+            raise
+        return hasher.hexdigest(), size, path
+
+    def _add_reference(self, name, digest, size, source_path):
+        from .models import ContentBlob
+
+        with transaction.atomic():
+            # Update first so the row is write-locked before the file is checked
+            if not ContentBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1):
+                try:
+                    with transaction.atomic():
+                        ContentBlob.objects.create(name=name, digest=digest, size=size, ref_count=1)
+                except IntegrityError:
+                    # Created concurrently
+                    ContentBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                # Already have it: drop the new copy
+                os.remove(source_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                file_move_safe(source_path, full_path, allow_overwrite=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        return name
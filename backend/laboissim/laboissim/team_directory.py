@@ -0,0 +1,95 @@
+"""
+Team directory read model.
+
+/api/team-members used to serialize every active user with its profile on
+each request. TeamDirectoryEntry stores that payload per user instead,
+refreshed whenever a User or UserProfile is saved, so listing the team is a
+single query and a profile page is one primary-key read.
+"""
+from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework import serializers
+
+from .models import TeamDirectoryEntry, UserProfile
+
+# Same fields, in the same order, as ExtendedUserSerializer and UserProfileSerializer
+PROFILE_FIELDS = ['phone', 'bio', 'profile_image', 'location', 'institution', 'website', 'linkedin', 'twitter',
+                  'github', 'role']
+
+_datetime_field = serializers.DateTimeField()
+
+
+def directory_data(user, profile):
+    """Render `user` exactly like ExtendedUserSerializer does without a request"""
+    profile_data = None
+    if profile is not None:
+        profile_data = {}
+        for name in PROFILE_FIELDS:
+            value = getattr(profile, name)
+            if name == 'profile_image':
+                value = value.url if value else None
+            profile_data[name] = value
+
+    if user.is_superuser:
+        role = 'admin'
+    else:
+        role = profile.role if profile is not None else 'member'
+
+    return {
+        'id': user.pk,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'is_staff': user.is_staff,
+        'is_superuser': user.is_superuser,
+        'date_joined': _datetime_field.to_representation(user.date_joined),
+        'profile': profile_data,
+        'full_name': f"{user.first_name} {user.last_name}".strip() or user.username,
+        'role': role,
+    }
+
+
+def sync_user(user, profile=None):
+    """Write the directory entry of `user`"""
+    if profile is None:
+        try:
+            profile = user.profile
+        except ObjectDoesNotExist:
+            pass
+    data = directory_data(user, profile)
+    values = {
+        'is_active': user.is_active,
+        'role': data['role'],
+        'institution': (profile.institution if profile is not None else None) or '',
+        'data': data,
+    }
+    # Update first: entries almost always exist, so this is one query
+    if not TeamDirectoryEntry.objects.filter(user_id=user.pk).update(**values):
+        TeamDirectoryEntry.objects.update_or_create(user_id=user.pk, defaults=values)
+
+
+def rebuild():
+    """Recreate every directory entry; returns the number of users written"""
+    count = 0
+    for user in User.objects.select_related('profile').iterator(chunk_size=500):
+        sync_user(user)
+        count += 1
+    return count
+
+
+@receiver(post_save, sender=User)
+def sync_user_entry(sender, instance, raw=False, **kwargs):
+    # Profile saves that follow a user save sync the entry themselves
+    if raw or hasattr(instance, 'profile'):
+        return
+    sync_user(instance)
+
+
+@receiver(post_save, sender=UserProfile)
+def sync_profile_entry(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    sync_user(instance.user, instance)
@@ -0,0 +1,261 @@
+"""
+Plain-text extraction for uploaded PDFs and office documents.
+
+Saving a ProjectDocument or UserFile with an extractable file queues an
+ExtractedText row as 'pending'. `manage.py extract_text` claims pending rows
+and extracts them in a process pool, away from the web workers, then feeds
+the text into the search index. Rows left 'processing' by a worker that died
+are put back in the queue when the next worker starts, so the stage resumes
+after a crash.
+
+DOCX, PPTX and XLSX are read with the standard library. PDFs need the
+optional `pypdf` package or poppler's `pdftotext`.
+"""
+import logging
+import os
+import shutil
+import subprocess
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ExtractedText, ProjectDocument, UserFile
+
+logger = logging.getLogger(__name__)
+
+EXTRACTABLE_EXTENSIONS = ('.pdf', '.docx', '.pptx', '.xlsx')
+SOURCE_MODELS = {'document': ProjectDocument, 'file': UserFile}
+
+# Guards against zip bombs in office files
+MAX_XML_MEMBER_SIZE = 64 * 1024 * 1024
+
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+A_NS = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+S_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+class ExtractionError(Exception):
+    pass
+
+
+# Extractors. These run in worker processes: plain functions of a path, no ORM.
+
+def extract_file(path, max_chars):
+    """Return the plain text of the file at `path`, at most `max_chars` long"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.pdf':
+        text = _extract_pdf(path)
+    elif extension == '.docx':
+        text = _extract_xml_members(path, ['word/document.xml'], paragraph_tag=W_NS + 'p', text_tag=W_NS + 't')
+    elif extension == '.pptx':
+        text = _extract_xml_members(path, _sorted_members(path, 'ppt/slides/slide'),
+                                    paragraph_tag=A_NS + 'p', text_tag=A_NS + 't')
+    elif extension == '.xlsx':
+        text = _extract_xml_members(path, ['xl/sharedStrings.xml'] + _sorted_members(path, 'xl/worksheets/sheet'),
+                                    paragraph_tag=S_NS + 'si', text_tag=S_NS + 't')
+    else:
+        raise ExtractionError(f'Unsupported file type {extension}')
+    return ' '.join(text.split())[:max_chars]
+
+
+def _sorted_members(path, prefix):
+    with zipfile.ZipFile(path) as archive:
+        names = [name for name in archive.namelist() if name.startswith(prefix) and name.endswith('.xml')]
+    # slide2.xml before slide10.xml
+    return sorted(names, key=lambda name: (len(name), name))
+
+
+def _extract_xml_members(path, members, paragraph_tag, text_tag):
+    parts = []
+    try:
+        with zipfile.ZipFile(path) as archive:
+            for member in members:
+                try:
+                    info = archive.getinfo(member)
+                except KeyError:
+                    continue
+                if info.file_size > MAX_XML_MEMBER_SIZE:
+                    raise ExtractionError(f'{member} is too large')
+                with archive.open(info) as f:
+                    for event, element in ElementTree.iterparse(f, events=('end',)):
+                        if element.tag == text_tag and element.text:
+                            parts.append(element.text)
+                        elif element.tag == paragraph_tag:
+                            parts.append('\n')
+                            element.clear()
+    except (zipfile.BadZipFile, ElementTree.ParseError) as e:
+        raise ExtractionError(f'Unreadable file: {e}')
+    return ''.join(parts)
+
+
+def _extract_pdf(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        PdfReader = None
+
+    if PdfReader is not None:
+        try:
+            reader = PdfReader(path)
+            return '\n'.join(page.extract_text() or '' for page in reader.pages)
+        except Exception as e:
+            raise ExtractionError(f'Unreadable PDF: {e}')
+
+    if shutil.which('pdftotext') is None:
+        raise ExtractionError('No PDF text extractor available (install pypdf or poppler-utils)')
+    result = subprocess.run(['pdftotext', '-q', '-enc', 'UTF-8', path, '-'],
+                            capture_output=True, timeout=300)
+    if result.returncode != 0:
+        raise ExtractionError(f'pdftotext exited with status {result.returncode}')
+    return result.stdout.decode('utf-8', errors='replace')
+
+
+def _extract_job(path, max_chars):
+    """Process pool entry point: returns (text, error)"""
+    try:
+        return extract_file(path, max_chars), ''
+    except ExtractionError as e:
+        return '', str(e)
+    except Exception as e:
+        return '', f'{type(e).__name__}: {e}'
+
+
+# Job queue
+
+def is_extractable(name):
+    return bool(name) and name.lower().endswith(EXTRACTABLE_EXTENSIONS)
+
+
+def queue(source, instance):
+    """Queue extraction of `instance`'s file unless that file was already handled"""
+    name = instance.file.name
+    if not is_extractable(name):
+        ExtractedText.objects.filter(source=source, object_id=instance.pk).delete()
+        return
+    updated = (ExtractedText.objects
+               .filter(source=source, object_id=instance.pk)
+               .exclude(file_name=name)
+               .update(file_name=name, status='pending', attempts=0, error='',
+                       compressed_text=None, text_length=0))
+    if not updated:
+        ExtractedText.objects.get_or_create(source=source, object_id=instance.pk, defaults={'file_name': name})
+
+
+def text_for(source, object_id):
+    """The extracted text of an object, or '' if there is none yet"""
+    extracted = (ExtractedText.objects
+                 .filter(source=source, object_id=object_id, status='done')
+                 .only('compressed_text').first())
+    return extracted.text if extracted is not None else ''
+
+
+def retry_failed():
+    """Give failed extractions a new set of attempts, e.g. after installing pypdf"""
+    return ExtractedText.objects.filter(status='failed').update(status='pending', attempts=0, error='')
+
+
+def reset_stale(older_than=None):
+    """Put rows stuck in 'processing' (their worker died) back in the queue"""
+    # Only rows idle for `older_than`, so workers running in parallel keep their jobs
+    stale = ExtractedText.objects.filter(status='processing')
+    if older_than is not None:
+        stale = stale.filter(updated_at__lt=timezone.now() - older_than)
+    return stale.update(status='pending')
+
+
+def claim(batch_size):
+    """Mark up to `batch_size` pending rows as processing and return them"""
+    max_attempts = getattr(settings, 'TEXT_EXTRACTION_MAX_ATTEMPTS', 3)
+    with transaction.atomic():
+        jobs = list(ExtractedText.objects.select_for_update(skip_locked=True)
+                    .filter(status='pending', attempts__lt=max_attempts)
+                    .order_by('updated_at')[:batch_size])
+        ids = [job.pk for job in jobs]
+        ExtractedText.objects.filter(pk__in=ids).update(
+            status='processing', attempts=F('attempts') + 1, updated_at=timezone.now()
+        )
+    return jobs
+
+
+def run(batch_size=20, workers=None, stop_when_idle=True, poll_interval=10):
+    """Work the queue; returns (done, failed) counts"""
+    workers = workers or getattr(settings, 'TEXT_EXTRACTION_WORKERS', 2)
+    max_chars = getattr(settings, 'TEXT_EXTRACTION_MAX_CHARS', 1_000_000)
+    stale_after = timedelta(minutes=getattr(settings, 'TEXT_EXTRACTION_STALE_MINUTES', 30))
+    reset = reset_stale(stale_after)
+    if reset:
+        logger.info("Re-queued %s interrupted text extractions", reset)
+
+    done = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            jobs = claim(batch_size)
+            if not jobs:
+                if stop_when_idle:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            futures = {job.pk: pool.submit(_extract_job, default_storage.path(job.file_name), max_chars)
+                       for job in jobs}
+            for job in jobs:
+                text, error = futures[job.pk].result()
+                if error:
+                    failed += 1
+                    _finish(job, 'failed', '', error)
+                else:
+                    done += 1
+                    _finish(job, 'done', text, '')
+    return done, failed
+
+
+def _finish(job, status, text, error):
+    max_attempts = getattr(settings, 'TEXT_EXTRACTION_MAX_ATTEMPTS', 3)
+    job.text = text
+    # Failures are retried until the attempts run out
+    if status == 'failed' and job.attempts + 1 < max_attempts:
+        status = 'pending'
+    # Only write if the file was not replaced in the meantime
+    updated = (ExtractedText.objects
+               .filter(pk=job.pk, file_name=job.file_name, status='processing')
+               .update(status=status, error=error, compressed_text=job.compressed_text,
+                       text_length=job.text_length, updated_at=timezone.now()))
+    if updated and status == 'done':
+        _reindex(job.source, job.object_id)
+
+
+def _reindex(source, object_id):
+    from . import search
+
+    instance = SOURCE_MODELS[source].objects.filter(pk=object_id).first()
+    if instance is not None:
+        search.index_object(instance)
+
+
+@receiver(post_save, sender=ProjectDocument)
+def queue_document(sender, instance, raw=False, **kwargs):
+    if not raw:
+        queue('document', instance)
+
+
+@receiver(post_save, sender=UserFile)
+def queue_user_file(sender, instance, raw=False, **kwargs):
+    if not raw:
+        queue('file', instance)
+
+
+@receiver(post_delete, sender=ProjectDocument)
+@receiver(post_delete, sender=UserFile)
+def delete_extracted_text(sender, instance, **kwargs):
+    source = 'document' if sender is ProjectDocument else 'file'
+    ExtractedText.objects.filter(source=source, object_id=instance.pk).delete()
@@ -0,0 +1,44 @@
+"""
+Rate limits for the login endpoints, applied before any password is hashed.
+
+LoginIPThrottle counts the attempts of one client address (scope
+'login_ip'), LoginAccountThrottle the attempts on one account, whatever the
+address (scope 'login_account', keyed by the lower-cased email or username
+so guessing one password from many addresses is limited too). Rates are in
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+"""
+import hashlib
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from .user_emails import normalize
+
+
+class LoginThrottle(SimpleRateThrottle):
+    def get_rate(self):
+        # Read when used rather than at import, so override_settings applies;
+        # a scope without a rate is not limited
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+
+class LoginIPThrottle(LoginThrottle):
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginAccountThrottle(LoginThrottle):
+    scope = 'login_account'
+
+    def get_cache_key(self, request, view):
+        identifier = request.data.get('email') or request.data.get('username')
+        if not isinstance(identifier, str) or not normalize(identifier):
+            return None
+        # Hashed so any input makes a valid cache key
+        ident = hashlib.sha256(normalize(identifier).encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+LOGIN_THROTTLES = [LoginIPThrottle, LoginAccountThrottle]
@@ -0,0 +1,57 @@
+"""
+Revocation of rotated refresh tokens.
+
+With ROTATE_REFRESH_TOKENS and BLACKLIST_AFTER_ROTATION, a refresh token
+may be used once. simplejwt enforces that with its token_blacklist app,
+which records every token it issues and is not installed here. Instead,
+RotatingTokenRefreshSerializer records only the tokens that were used, by
+their jti, in RevokedToken. Inserting the jti is also the check: the
+unique index rejects a second use, even by a concurrent request.
+
+A row is only needed until its token expires, after which simplejwt rejects
+the token anyway. `manage.py purge_revoked_tokens` (run from cron, e.g.
+hourly) deletes expired rows in small batches, so the table holds about
+REFRESH_TOKEN_LIFETIME worth of refreshes and a refresh stays one indexed
+insert however long the site runs.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken
+
+
+def revoke(token):
+    """Revoke `token`; False when it already was"""
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(jti=token[api_settings.JTI_CLAIM], expires_at=datetime_from_epoch(token['exp']))
+    except IntegrityError:
+        return False
+    return True
+
+
+def purge(batch_size=1000):
+    """Delete the rows of expired tokens, `batch_size` at a time to keep locks short"""
+    now = timezone.now()
+    total = 0
+    while True:
+        ids = list(RevokedToken.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += RevokedToken.objects.filter(pk__in=ids).delete()[0]
+
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """TokenRefreshSerializer that accepts each refresh token once when rotation is on"""
+
+    def validate(self, attrs):
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            refresh = self.token_class(attrs['refresh'])
+            if not revoke(refresh):
+                raise TokenError(_('Token is blacklisted'))
+        return super().validate(attrs)
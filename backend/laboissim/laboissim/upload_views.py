@@ -0,0 +1,253 @@
+import mimetypes
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from rest_framework import mixins, serializers, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .file_views import UserFileSerializer
+from .models import ProjectDocument, UploadSession, UserFile
+from .storage import ContentAddressedStorage
+from .views import ProjectDocumentSerializer
+
+READ_SIZE = 64 * 1024
+
+
+class AssembledFile(File):
+    """
+    A completed upload on local disk. Exposing temporary_file_path() lets
+    FileSystemStorage move it into place instead of copying it.
+    """
+
+    def __init__(self, path, name):
+        super().__init__(None, name)
+        self._path = path
+        self.size = os.path.getsize(path)
+
+    def temporary_file_path(self):
+        return self._path
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    total_chunks = serializers.ReadOnlyField()
+    missing_chunks = serializers.ReadOnlyField()
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'target', 'project', 'filename', 'description', 'file_type', 'size', 'sha256', 'chunk_size',
+                  'total_chunks', 'received_chunks', 'missing_chunks', 'status', 'result_id', 'created_at']
+        read_only_fields = ['chunk_size', 'received_chunks', 'status', 'result_id', 'created_at']
+
+    def validate(self, attrs):
+        if attrs['target'] == 'project_document' and not attrs.get('project'):
+            raise serializers.ValidationError({'project': 'Project ID is required'})
+        file_type = attrs.get('file_type')
+        if (attrs['target'] == 'project_document' and file_type and
+                file_type not in dict(ProjectDocument.FILE_TYPE_CHOICES)):
+            raise serializers.ValidationError({'file_type': 'Invalid file type'})
+        sha256 = attrs.get('sha256', '').lower()
+        if sha256 and (len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256)):
+            raise serializers.ValidationError({'sha256': 'Expected a hex SHA-256 digest'})
+        attrs['sha256'] = sha256
+        if attrs['size'] < 0:
+            raise serializers.ValidationError({'size': 'Size cannot be negative'})
+        max_size = getattr(settings, 'UPLOAD_MAX_SIZE', None)
+        if max_size is not None and attrs['size'] > max_size:
+            raise serializers.ValidationError({'size': f'Files larger than {max_size} bytes are not accepted'})
+        return attrs
+
+
+class UploadSessionViewSet(mixins.CreateModelMixin,
+                           mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin,
+                           viewsets.GenericViewSet):
+    """
+    Resumable chunked uploads.
+
+    1. POST /api/uploads with target, filename, size (and project) to open a session.
+       With content-addressed storage, sending sha256 completes the upload
+       at once if the user already stores that content.
+    2. PUT the raw bytes of each chunk to /api/uploads/<id>/chunks/<index>;
+       GET /api/uploads/<id> lists the chunks still missing after a failure
+    3. POST /api/uploads/<id>/complete to attach the file
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        project = serializer.validated_data.get('project')
+        if serializer.validated_data['target'] == 'project_document':
+            if not project.can_user_upload_files(self.request.user):
+                raise PermissionDenied("You don't have permission to upload files to this project")
+        else:
+            serializer.validated_data['project'] = None
+        session = serializer.save(user=self.request.user, chunk_size=settings.UPLOAD_CHUNK_SIZE)
+
+        # "Already have it": attach the existing blob without any chunk. The
+        # declared hash is not proven, so only blobs this user already stores
+        # are reused; anything else is uploaded and hashed by the server
+        if session.sha256 and getattr(settings, 'CONTENT_ADDRESSED_INSTANT_UPLOADS', False):
+            if isinstance(default_storage, ContentAddressedStorage) and self._user_stores(session):
+                stored_name = default_storage.reference(session.sha256, session.filename, session.size)
+                if stored_name is not None:
+                    self._complete(session, stored_name)
+
+    def _user_stores(self, session):
+        name = default_storage.blob_name(session.sha256, session.filename)
+        return (UserFile.objects.filter(uploaded_by=session.user, file=name).exists()
+                or ProjectDocument.objects.filter(uploaded_by=session.user, file=name).exists())
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        session = UploadSession.objects.get(pk=response.data['id'])
+        if session.status == 'complete':
+            return Response(self._completed_response(session), status=status.HTTP_201_CREATED)
+        return response
+
+    def perform_destroy(self, instance):
+        """Abort the upload and drop the chunks received so far"""
+        if instance.status == 'active' and default_storage.exists(instance.temp_name):
+            default_storage.delete(instance.temp_name)
+        instance.delete()
+
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<index>[0-9]+)')
+    def chunk(self, request, pk=None, index=None):
+        """Write one chunk at its offset in the upload; re-sending a chunk overwrites it"""
+        session = self.get_object()
+        if session.status != 'active':
+            return Response({'error': 'Upload is already complete'}, status=status.HTTP_409_CONFLICT)
+
+        index = int(index)
+        if index >= session.total_chunks:
+            return Response({'error': 'Chunk index out of range'}, status=status.HTTP_400_BAD_REQUEST)
+
+        offset, length = session.chunk_bounds(index)
+        written = self._write_chunk(session, request.stream, offset, length)
+        if written != length:
+            return Response({
+                'error': f'Chunk {index} must be {length} bytes, received {written}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if index not in session.received_chunks:
+                session.received_chunks = sorted(session.received_chunks + [index])
+                session.save(update_fields=['received_chunks', 'updated_at'])
+
+        return Response(self.get_serializer(session).data)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """Attach the uploaded file as a ProjectDocument or UserFile"""
+        with transaction.atomic():
+            session = self.get_queryset().select_for_update().get(pk=self.get_object().pk)
+
+            if session.status == 'complete':
+                return Response(self._completed_response(session))
+
+            missing = session.missing_chunks
+            if missing:
+                return Response({
+                    'error': 'Upload is missing chunks',
+                    'missing_chunks': missing
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            path = self._temp_path(session)
+            if not os.path.exists(path):
+                open(path, 'wb').close()
+            if os.path.getsize(path) != session.size:
+                return Response({'error': 'Upload size does not match'}, status=status.HTTP_400_BAD_REQUEST)
+
+            if session.target == 'project_document':
+                if not session.project.can_user_upload_files(request.user):
+                    raise PermissionDenied("You don't have permission to upload files to this project")
+                model = ProjectDocument
+            else:
+                model = UserFile
+
+            # Move the assembled upload to its final storage name
+            name = model._meta.get_field('file').generate_filename(None, session.filename)
+            stored_name = default_storage.save(name, AssembledFile(path, session.filename))
+            result = self._complete(session, stored_name)
+
+        return Response(self._completed_response(session, result), status=status.HTTP_201_CREATED)
+
+    def _temp_path(self, session):
+        path = default_storage.path(session.temp_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def _write_chunk(self, session, stream, offset, length):
+        """Copy the request body into the upload file, never past the chunk's end"""
+        path = self._temp_path(session)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        written = 0
+        with os.fdopen(fd, 'r+b') as f:
+            f.seek(offset)
+            while stream is not None:
+                data = stream.read(READ_SIZE)
+                if not data:
+                    break
+                if written + len(data) > length:
+                    return written + len(data)
+                f.write(data)
+                written += len(data)
+        return written
+
+    def _complete(self, session, stored_name):
+        """Create the target object for the stored file and close the session"""
+        if session.target == 'project_document':
+            result = self._attach_project_document(session, stored_name)
+        else:
+            result = self._attach_user_file(session, stored_name)
+        session.status = 'complete'
+        session.result_id = result.pk
+        session.save(update_fields=['status', 'result_id', 'updated_at'])
+        return result
+
+    def _attach_project_document(self, session, stored_name):
+        document = ProjectDocument(
+            project=session.project,
+            name=session.filename,
+            description=session.description,
+            uploaded_by=session.user,
+            size=session.size,
+        )
+        document.file.name = stored_name
+        # Auto-detect file type if not provided
+        document.file_type = session.file_type or ('image' if document.is_image else 'document')
+        document.save()
+        return document
+
+    def _attach_user_file(self, session, stored_name):
+        user_file = UserFile(
+            name=session.filename,
+            uploaded_by=session.user,
+            file_type=mimetypes.guess_type(session.filename)[0] or 'application/octet-stream',
+            size=session.size,
+        )
+        user_file.file.name = stored_name
+        user_file.save()
+        return user_file
+
+    def _completed_response(self, session, result=None):
+        context = self.get_serializer_context()
+        if session.target == 'project_document':
+            result = result or ProjectDocument.objects.filter(pk=session.result_id).first()
+            result_data = ProjectDocumentSerializer(result, context=context).data if result else None
+        else:
+            result = result or UserFile.objects.filter(pk=session.result_id).first()
+            result_data = UserFileSerializer(result, context=context).data if result else None
+        return {
+            'upload': self.get_serializer(session).data,
+            'result': result_data,
+        }
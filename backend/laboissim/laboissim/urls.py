@@ -18,14 +18,20 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
     TokenRefreshView,
 )
 from rest_framework.routers import DefaultRouter
-from .email_token_view import EmailTokenObtainPairView, GoogleLoginJWTView
-from .views import CurrentUserView, SiteContentView, UserProfileView, TeamMembersView, update_user_role, ProjectViewSet, ProjectDocumentViewSet, ProjectDeletionRequestViewSet
+from .async_views import PublicationListView, PublicProjectsView, SiteContentAsyncView, TeamMembersAsyncView
+from .email_token_view import EmailTokenObtainPairView, GoogleLoginJWTView, UsernameTokenObtainPairView
+from .events_views import EventStreamView
+from .views import CurrentUserView, UserProfileView, TeamMemberDetailView, update_user_role, ProjectViewSet, ProjectDocumentViewSet, ProjectDeletionRequestViewSet
 from .file_views import FileViewSet
+from .metrics import metrics_view
+from .profiling_views import ProfileListView
+from .project_stats_views import ProjectStatsView
 from .publication_views import PublicationViewSet
+from .search_views import SearchView
+from .upload_views import UploadSessionViewSet
 
 
 router = DefaultRouter(trailing_slash=False)
@@ -34,15 +40,23 @@ router.register(r'publications', PublicationViewSet, basename='publication')
 router.register(r'projects', ProjectViewSet, basename='project')
 router.register(r'project-documents', ProjectDocumentViewSet, basename='project-document')
 router.register(r'project-deletion-requests', ProjectDeletionRequestViewSet, basename='project-deletion-request')
+router.register(r'uploads', UploadSessionViewSet, basename='upload')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/', UsernameTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/email/', EmailTokenObtainPairView.as_view(), name='token_obtain_pair_email'),
 
     #  NEW PATH 
     path('api/admin/update-user-role/<int:user_id>/', update_user_role, name='update_user_role'),
+    path('api/admin/profiles/', ProfileListView.as_view(), name='admin-profiles'),
+
+    # Async GET handlers (see async_views.py), ahead of the router routes they shadow
+    path('api/projects/public', PublicProjectsView.as_view(), name='project-public'),
+    path('api/publications', PublicationListView.as_view(), name='publication-list'),
+    # Ahead of the router, which would take "stats" for a project id
+    path('api/projects/stats', ProjectStatsView.as_view(), name='project-stats'),
 
     # This router handles all requests starting with 'api/'
     path('api/', include(router.urls)),
@@ -50,10 +64,15 @@ urlpatterns = [
     path('auth/google/jwt/', GoogleLoginJWTView.as_view(), name='google_login_jwt'),
     path('api/user/', CurrentUserView.as_view(), name='current-user'),
     path('api/user/profile/', UserProfileView.as_view(), name='user-profile'),
-    path('api/site-content/', SiteContentView.as_view(), name='site-content'),
-    path('api/team-members/', TeamMembersView.as_view(), name='team-members'),
+    path('api/site-content/', SiteContentAsyncView.as_view(), name='site-content'),
+    path('api/team-members/', TeamMembersAsyncView.as_view(), name='team-members'),
+    path('api/team-members/<int:user_id>/', TeamMemberDetailView.as_view(), name='team-member-detail'),
+    path('api/search/', SearchView.as_view(), name='search'),
+    path('api/events/', EventStreamView.as_view(), name='events'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
-# Serve media files in development
+# Serve media files in development; in production files are only sent by the
+# permission-checked download views (see file_serving.py)
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
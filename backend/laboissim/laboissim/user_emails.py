@@ -0,0 +1,86 @@
+"""
+Case-insensitive email lookup for logins.
+
+auth_user.email is neither indexed nor unique, so finding a user by email
+scanned the table and failed with MultipleObjectsReturned when two accounts
+shared an address. UserEmail holds each user's lower-cased email under a
+unique index, kept in sync whenever a User is saved or deleted.
+
+When several accounts share an address, the oldest one (lowest id) owns it
+and is the one email logins and the Google pipeline resolve to. If the owner
+changes its email or is deleted, the address passes to the next oldest.
+"""
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import UserEmail
+
+
+def normalize(email):
+    return (email or '').strip().lower()
+
+
+def find_user(email):
+    """The user owning `email`, whatever its case, or None"""
+    email = normalize(email)
+    if not email:
+        return None
+    return User.objects.filter(normalized_email__email=email).first()
+
+
+def sync_user(user):
+    """Write the email row of `user`"""
+    email = normalize(user.email)
+    previous = UserEmail.objects.filter(user_id=user.pk).values_list('email', flat=True).first()
+    if previous == email:
+        return
+    if previous is not None:
+        UserEmail.objects.filter(user_id=user.pk).delete()
+        _reassign(previous)
+    if email and not UserEmail.objects.filter(email=email).exists():
+        try:
+            with transaction.atomic():
+                UserEmail.objects.create(user_id=user.pk, email=email)
+        except IntegrityError:
+            pass  # claimed by a concurrent save
+
+
+def _reassign(email):
+    """Give a released `email` to the oldest other account using it"""
+    heir = User.objects.filter(email__iexact=email).order_by('pk').first()
+    if heir is not None and normalize(heir.email) == email:
+        try:
+            with transaction.atomic():
+                UserEmail.objects.create(user_id=heir.pk, email=email)
+        except IntegrityError:
+            pass
+
+
+def rebuild():
+    """Recreate every email row; returns the number of users written"""
+    UserEmail.objects.all().delete()
+    owners = {}
+    for user_id, email in User.objects.order_by('pk').values_list('pk', 'email').iterator(chunk_size=500):
+        email = normalize(email)
+        if email:
+            owners.setdefault(email, user_id)
+    UserEmail.objects.bulk_create([UserEmail(user_id=user_id, email=email) for email, user_id in owners.items()],
+                                  batch_size=500)
+    return len(owners)
+
+
+@receiver(post_save, sender=User)
+def sync_user_email(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'email' not in update_fields):
+        return
+    sync_user(instance)
+
+
+@receiver(post_delete, sender=User)
+def release_user_email(sender, instance, **kwargs):
+    # The row itself went with the cascade
+    email = normalize(instance.email)
+    if email:
+        _reassign(email)
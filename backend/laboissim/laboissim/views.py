@@ -2,13 +2,25 @@ from django.contrib.auth.models import User
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
-from rest_framework import serializers, status, viewsets
+from rest_framework import generics, serializers, status, viewsets
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.decorators import api_view, permission_classes, action
 from django.db import transaction
-from .models import SiteContent, UserProfile, Project, ProjectDocument, ProjectDeletionRequest
+from django.utils.cache import get_conditional_response
+from .models import SiteContent, UserProfile, Project, ProjectDocument, ProjectDeletionRequest, TeamDirectoryEntry
+from .permission_context import get_permission_context
+from .query_planner import plan_queryset
+from .sparse_fieldsets import SparseFieldsetMixin
+from . import public_feed, site_content
 from django.db import models
 from rest_framework.exceptions import PermissionDenied
+from .authz_logging import log_decision
+from .file_serving import serve_file
+from .bulk_ingest import ingest_documents
+from .derivatives import derivative_url
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Custom permission class for projects
 class ProjectPermission:
@@ -26,7 +38,7 @@ class ProjectPermission:
         if not hasattr(user, 'profile'):
             from .models import UserProfile
             profile, created = UserProfile.objects.get_or_create(user=user, defaults={'role': 'member'})
-            print(f"Created profile for user {user.username} with role: {profile.role}")
+            logger.info("Created profile for user %s with role: %s", user.username, profile.role)
         
         return request.user.is_authenticated
     
@@ -37,45 +49,34 @@ class ProjectPermission:
         if not hasattr(user, 'profile'):
             from .models import UserProfile
             profile, created = UserProfile.objects.get_or_create(user=user, defaults={'role': 'member'})
-            print(f"Created profile for user {user.username} with role: {profile.role}")
-        
-        print(f"=== PERMISSION CHECK DEBUG ===")
-        print(f"User: {user.username}")
-        print(f"User ID: {user.id}")
-        print(f"Has profile: {hasattr(user, 'profile')}")
-        if hasattr(user, 'profile'):
-            print(f"Profile role: {user.profile.role}")
-            print(f"Is admin: {user.profile.is_admin}")
-        print(f"Action: {view.action}")
-        print(f"Object created by: {obj.created_by.username}")
-        print(f"Object created by ID: {obj.created_by.id}")
+            logger.info("Created profile for user %s with role: %s", user.username, profile.role)
+        
+        context = get_permission_context(user)
         
         # Admin users can do anything
-        if hasattr(user, 'profile') and user.profile.is_admin:
-            print("Permission granted: User is admin")
+        if context.is_admin:
+            log_decision(request, view, obj, True, 'admin')
             return True
         # Superusers can also do anything
         if user.is_superuser:
-            print("Permission granted: User is superuser")
+            log_decision(request, view, obj, True, 'superuser')
             return True
             
         # For update/delete operations
         if view.action in ['update', 'partial_update', 'destroy']:
             # Project creators can edit their own projects
-            if obj.created_by == user:
-                print("Permission granted: User is project creator")
+            if context.is_creator(obj):
+                log_decision(request, view, obj, True, 'project_creator')
                 return True
             # Chef d'équipe can edit their own projects
-            if (hasattr(user, 'profile') and 
-                user.profile.is_chef_d_equipe and 
-                obj.created_by == user):
-                print("Permission granted: User is chef d'équipe and project creator")
+            if context.is_chef_d_equipe and context.is_creator(obj):
+                log_decision(request, view, obj, True, 'chef_d_equipe_creator')
                 return True
-            print("Permission denied: User cannot edit this project")
+            log_decision(request, view, obj, False, 'not_project_creator')
             return False
             
         # For other operations, allow if user is authenticated
-        print("Permission granted: User is authenticated")
+        log_decision(request, view, obj, True, 'authenticated')
         return True
 
 # Serializer for the User model
@@ -129,33 +130,43 @@ class SiteContentSerializer(serializers.ModelSerializer):
 
 # Project Serializer
 
-class ProjectDocumentSerializer(serializers.ModelSerializer):
+class ProjectDocumentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     uploaded_by = ExtendedUserSerializer(read_only=True)
     file_size_mb = serializers.ReadOnlyField()
     file_extension = serializers.ReadOnlyField()
     is_image = serializers.ReadOnlyField()
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
     
     class Meta:
         model = ProjectDocument
-        fields = ['id', 'file', 'name', 'file_type', 'description', 'uploaded_by', 'uploaded_at', 'is_public', 'file_size_mb', 'file_extension', 'is_image']
+        fields = ['id', 'file', 'name', 'file_type', 'description', 'uploaded_by', 'uploaded_at', 'is_public', 'file_size_mb', 'file_extension', 'is_image', 'thumbnail_url', 'preview_url']
         read_only_fields = ['uploaded_by', 'uploaded_at', 'file_size_mb', 'file_extension', 'is_image']
     
+    def get_thumbnail_url(self, obj):
+        return derivative_url(self.context.get('request'), obj.thumbnail)
+    
+    def get_preview_url(self, obj):
+        return derivative_url(self.context.get('request'), obj.preview)
+    
     def create(self, validated_data):
         request = self.context.get('request')
         validated_data['uploaded_by'] = request.user
         return super().create(validated_data)
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     created_by = ExtendedUserSerializer(read_only=True)
     documents = ProjectDocumentSerializer(many=True, read_only=True)
     can_edit = serializers.SerializerMethodField()
     can_delete = serializers.SerializerMethodField()
     can_request_deletion = serializers.SerializerMethodField()
     has_pending_deletion_request = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Project
-        fields = '__all__'
+        exclude = ['thumbnail', 'preview', 'derivatives_source']
     
     def get_can_edit(self, obj):
         request = self.context.get('request')
@@ -178,6 +189,17 @@ class ProjectSerializer(serializers.ModelSerializer):
     def get_has_pending_deletion_request(self, obj):
         return obj.has_pending_deletion_request()
     
+    def get_thumbnail_url(self, obj):
+        return derivative_url(self.context.get('request'), obj.thumbnail)
+    
+    def get_preview_url(self, obj):
+        return derivative_url(self.context.get('request'), obj.preview)
+
+    def annotate_queryset(self, queryset):
+        """Resolve has_pending_deletion_request in the list query itself"""
+        pending = ProjectDeletionRequest.objects.filter(project=models.OuterRef('pk'), status='pending')
+        return queryset.annotate(pending_deletion_request_exists=models.Exists(pending))
+    
     def create(self, validated_data):
         request = self.context.get('request')
         validated_data['created_by'] = request.user
@@ -207,7 +229,7 @@ class ProjectSerializer(serializers.ModelSerializer):
         
         return super().update(instance, validated_data)
 
-class ProjectDeletionRequestSerializer(serializers.ModelSerializer):
+class ProjectDeletionRequestSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     requested_by = ExtendedUserSerializer(read_only=True)
     reviewed_by = ExtendedUserSerializer(read_only=True)
     project_title = serializers.CharField(source='project.title', read_only=True)
@@ -229,7 +251,7 @@ class ProjectDeletionRequestSerializer(serializers.ModelSerializer):
         validated_data['requested_by'] = request.user
         return super().create(validated_data)
 
-class ProjectDeletionRequestAdminSerializer(serializers.ModelSerializer):
+class ProjectDeletionRequestAdminSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for admin operations on deletion requests"""
     requested_by = ExtendedUserSerializer(read_only=True)
     reviewed_by = ExtendedUserSerializer(read_only=True)
@@ -246,9 +268,8 @@ class SiteContentView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        content, _ = SiteContent.objects.get_or_create(id=1)
-        serializer = SiteContentSerializer(content)
-        return Response(serializer.data)
+        # Served from the site content cache, see site_content.py
+        return Response(site_content.get_data())
 
     def put(self, request):
         if not request.user.is_staff:
@@ -268,15 +289,40 @@ class CurrentUserView(APIView):
         serializer = ExtendedUserSerializer(request.user)
         return Response(serializer.data)
 
+# Team members are read from the denormalized directory (see team_directory.py)
+class TeamDirectoryEntrySerializer(serializers.BaseSerializer):
+    def to_representation(self, instance):
+        # Same payload as ExtendedUserSerializer, rendered when the user was saved
+        return instance.data
+
+
 # API view to get all team members
-class TeamMembersView(APIView):
+class TeamMembersView(generics.ListAPIView):
+    """
+    Active team members, optionally filtered with ?role= and ?institution=.
+    Paginated when ?page_size= or ?cursor= is given.
+    """
     permission_classes = [AllowAny]
+    serializer_class = TeamDirectoryEntrySerializer
+    ordering = 'pk'
 
-    def get(self, request):
-        """Get all team members with their profiles"""
-        users = User.objects.filter(is_active=True).prefetch_related('profile')
-        serializer = ExtendedUserSerializer(users, many=True)
-        return Response(serializer.data)
+    def get_queryset(self):
+        queryset = TeamDirectoryEntry.objects.filter(is_active=True).order_by('pk')
+        role = self.request.query_params.get('role')
+        if role:
+            queryset = queryset.filter(role=role)
+        institution = self.request.query_params.get('institution')
+        if institution:
+            queryset = queryset.filter(institution=institution)
+        return queryset
+
+
+# API view to get a single team member
+class TeamMemberDetailView(generics.RetrieveAPIView):
+    permission_classes = [AllowAny]
+    serializer_class = TeamDirectoryEntrySerializer
+    queryset = TeamDirectoryEntry.objects.filter(is_active=True)
+    lookup_url_kwarg = 'user_id'
 
 # API view to update user profile
 class UserProfileView(APIView):
@@ -326,9 +372,10 @@ class ProjectViewSet(viewsets.ModelViewSet):
     serializer_class = ProjectSerializer
     permission_classes = [ProjectPermission]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
+    ordering = '-created_at'
     
     def get_queryset(self):
-        return Project.objects.all()
+        return plan_queryset(Project.objects.all(), self.get_serializer())
     
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -408,9 +455,25 @@ class ProjectViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def public(self, request):
         """Get all validated projects for public display"""
-        validated_projects = Project.objects.filter(is_validated=True)
-        serializer = self.get_serializer(validated_projects, many=True)
-        return Response(serializer.data)
+        # Served from the public feed cache, see public_feed.py
+        state = public_feed.get_state()
+        etag = public_feed.etag_for(request, state)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=state['last_modified'])
+        if not_modified is not None:
+            return public_feed.add_validators(not_modified, etag, state)
+
+        data = public_feed.get_cached(etag)
+        if data is None:
+            validated_projects = public_feed.filter_ids(request, self.get_queryset().filter(is_validated=True))
+            page = self.paginate_queryset(validated_projects)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                data = self.get_paginated_response(serializer.data).data
+            else:
+                serializer = self.get_serializer(validated_projects, many=True)
+                data = serializer.data
+            public_feed.set_cached(etag, data)
+        return public_feed.add_validators(Response(data), etag, state)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsAdminUser])
@@ -475,14 +538,15 @@ class ProjectDocumentViewSet(viewsets.ModelViewSet):
     serializer_class = ProjectDocumentSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
+    ordering = '-uploaded_at'
     
     def get_queryset(self):
         """Filter documents based on user permissions and project membership"""
         user = self.request.user
         
         # Admin can see all documents
-        if hasattr(user, 'profile') and user.profile.is_admin:
-            return ProjectDocument.objects.all()
+        if get_permission_context(user).is_admin:
+            return plan_queryset(ProjectDocument.objects.all(), self.get_serializer())
         
         # Get projects where user is a member or creator
         user_projects = Project.objects.filter(
@@ -491,7 +555,7 @@ class ProjectDocumentViewSet(viewsets.ModelViewSet):
         ).distinct()
         
         # Return documents from user's projects
-        return ProjectDocument.objects.filter(project__in=user_projects)
+        return plan_queryset(ProjectDocument.objects.filter(project__in=user_projects), self.get_serializer())
     
     def perform_create(self, serializer):
         """Create document with proper user assignment"""
@@ -511,12 +575,12 @@ class ProjectDocumentViewSet(viewsets.ModelViewSet):
                 file_obj = serializer.validated_data.get('file')
                 if file_obj:
                     # Auto-detect if it's an image
-                    if serializer.instance.is_image:
+                    if ProjectDocument(file=file_obj).is_image:
                         serializer.validated_data['file_type'] = 'image'
                     else:
                         serializer.validated_data['file_type'] = 'document'
             
-            serializer.save(uploaded_by=self.request.user)
+            serializer.save(uploaded_by=self.request.user, project=project)
             
         except Project.DoesNotExist:
             raise serializers.ValidationError("Project not found")
@@ -553,33 +617,24 @@ class ProjectDocumentViewSet(viewsets.ModelViewSet):
             if not project.can_user_upload_files(request.user):
                 raise PermissionDenied("You don't have permission to upload files to this project")
             
+            results = ingest_documents(project, request.user, files)
+            
             uploaded_files = []
             errors = []
-            
-            for file_obj in files:
-                try:
-                    # Auto-detect file type
-                    file_type = 'document'
-                    if any(file_obj.name.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp']):
-                        file_type = 'image'
-                    
-                    # Create document
-                    doc = ProjectDocument.objects.create(
-                        project=project,
-                        file=file_obj,
-                        name=file_obj.name,
-                        file_type=file_type,
-                        uploaded_by=request.user
-                    )
-                    
-                    uploaded_files.append(ProjectDocumentSerializer(doc).data)
-                    
-                except Exception as e:
-                    errors.append(f"Error uploading {file_obj.name}: {str(e)}")
+            per_file = []
+            for file_obj, document, error in results:
+                if document is not None:
+                    data = self.get_serializer(document).data
+                    uploaded_files.append(data)
+                    per_file.append({'name': file_obj.name, 'status': 'uploaded', 'document': data})
+                else:
+                    errors.append(f"Error uploading {file_obj.name}: {error}")
+                    per_file.append({'name': file_obj.name, 'status': 'error', 'error': error})
             
             return Response({
                 'uploaded_files': uploaded_files,
                 'errors': errors,
+                'results': per_file,
                 'message': f'Successfully uploaded {len(uploaded_files)} files'
             }, status=status.HTTP_201_CREATED)
             
@@ -596,15 +651,12 @@ class ProjectDocumentViewSet(viewsets.ModelViewSet):
         if not document.can_view(request.user):
             raise PermissionDenied("You don't have permission to view this file")
         
-        # Return file response for download
-        from django.http import FileResponse
+        # Sent by the configured download backend, see file_serving.py
         import os
         
         file_path = document.file.path
         if os.path.exists(file_path):
-            response = FileResponse(open(file_path, 'rb'))
-            response['Content-Disposition'] = f'attachment; filename="{document.name}"'
-            return response
+            return serve_file(request, file_path, filename=document.name, as_attachment=True)
         else:
             return Response({'error': 'File not found'}, status=status.HTTP_404_NOT_FOUND)
     
@@ -619,12 +671,17 @@ class ProjectDocumentViewSet(viewsets.ModelViewSet):
             project = Project.objects.get(id=project_id)
             
             # Check if user can view this project's files
-            if not (project.created_by == request.user or 
-                   request.user in project.members.all() or
-                   (hasattr(request.user, 'profile') and request.user.profile.is_admin)):
+            context = get_permission_context(request.user)
+            if not (context.is_creator(project) or 
+                   context.is_member(project) or
+                   context.is_admin):
                 raise PermissionDenied("You don't have permission to view this project's files")
             
-            documents = ProjectDocument.objects.filter(project=project)
+            documents = plan_queryset(ProjectDocument.objects.filter(project=project), self.get_serializer())
+            page = self.paginate_queryset(documents)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
             serializer = self.get_serializer(documents, many=True)
             return Response(serializer.data)
             
@@ -641,20 +698,21 @@ class ProjectDeletionRequestViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ProjectDeletionRequestSerializer
     permission_classes = [IsAuthenticated]
+    ordering = '-requested_at'
     
     def get_queryset(self):
         user = self.request.user
         
         # Admins (by role), staff, or superusers can see all deletion requests
         if (
-            (hasattr(user, 'profile') and user.profile.is_admin)
+            get_permission_context(user).is_admin
             or user.is_staff
             or user.is_superuser
         ):
-            return ProjectDeletionRequest.objects.all()
+            return plan_queryset(ProjectDeletionRequest.objects.all(), self.get_serializer())
         
         # Regular users can only see their own deletion requests
-        return ProjectDeletionRequest.objects.filter(requested_by=user)
+        return plan_queryset(ProjectDeletionRequest.objects.filter(requested_by=user), self.get_serializer())
     
     def get_serializer_class(self):
         """Use admin serializer for admin operations"""
@@ -167,6 +167,24 @@ export default function AdminPage() {
     }
   }, [user, activeTab]);
 
+  // Refresh on server-sent change events instead of waiting for a tab switch
+  useEffect(() => {
+    if (!user) return;
+    const isAdmin = user.role === "admin" || (user as any).is_staff || (user as any).is_superuser;
+    if (!isAdmin) return;
+    const accessToken = localStorage.getItem('access_token') || localStorage.getItem('token');
+    if (!accessToken) return;
+    // EventSource cannot send an Authorization header
+    const events = new EventSource(`http://localhost:8000/api/events/?token=${encodeURIComponent(accessToken)}`);
+    events.addEventListener('deletion_request', () => fetchDeletionRequests());
+    events.addEventListener('project', () => fetchProjects());
+    events.addEventListener('reset', () => {
+      fetchProjects();
+      fetchDeletionRequests();
+    });
+    return () => events.close();
+  }, [user]);
+
   const fetchProjects = async () => {
     setLoadingProjects(true);
     try {
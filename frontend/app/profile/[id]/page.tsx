@@ -44,17 +44,11 @@ export default function TeamMemberProfilePage() {
   const fetchMemberData = async () => {
     try {
       setLoading(true)
-      const response = await fetch("http://localhost:8000/api/team-members/")
+      const response = await fetch(`http://localhost:8000/api/team-members/${params.id}/`)
       if (response.ok) {
-        const members = await response.json()
-        const foundMember = members.find((m: TeamMember) => m.id.toString() === params.id)
-        if (foundMember) {
-          setMember(foundMember)
-        } else {
-          // Member not found, redirect to about page
-          router.push("/about?tab=team")
-        }
+        setMember(await response.json())
       } else {
+        // Member not found, redirect to about page
         router.push("/about?tab=team")
       }
     } catch (error) {
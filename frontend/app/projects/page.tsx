@@ -289,10 +289,37 @@ export default function ProjectsPage() {
       }
     }
 
+    // Refetch only the project a change event is about
+    const refreshProject = async (projectId: number) => {
+      try {
+        const response = await fetch(`http://localhost:8000/api/projects/public?ids=${projectId}`)
+        if (!response.ok) return
+        const [project]: Project[] = await response.json()
+        setProjects((current) => {
+          const others = current.filter((p) => p.id !== projectId)
+          if (!project) return others
+          return current.some((p) => p.id === projectId)
+            ? current.map((p) => (p.id === projectId ? project : p))
+            : [project, ...others]
+        })
+      } catch (err) {
+        console.error('Error refreshing project:', err)
+      }
+    }
+
     fetchProjects()
-    // Poll every 30 seconds for updates
-    const interval = setInterval(fetchProjects, 30000)
-    return () => clearInterval(interval)
+    // Server-sent change events instead of polling; EventSource reconnects
+    // by itself and resumes from the last event it received
+    const events = new EventSource('http://localhost:8000/api/events/')
+    const onChange = (event: MessageEvent) => {
+      const { project_id } = JSON.parse(event.data)
+      if (project_id) refreshProject(project_id)
+    }
+    events.addEventListener('project', onChange)
+    events.addEventListener('document', onChange)
+    // Some events were missed for good: reload the whole list
+    events.addEventListener('reset', fetchProjects)
+    return () => events.close()
   }, [])
 
   const fadeInUp = {
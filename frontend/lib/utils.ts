@@ -32,6 +32,8 @@ export async function refreshToken() {
   const data = await res.json();
   if (data.access) {
     localStorage.setItem('token', data.access);
+    // Refresh tokens are rotated: the one just sent cannot be used again
+    if (data.refresh) localStorage.setItem('refresh', data.refresh);
     return data.access;
   }
   return null;